@@ -1,43 +1,290 @@
 import google.generativeai as genai
 import json
+import time
+import base64
 import logging
-from backend.config import GEMINI_API_KEY
-from backend.utils.rag import FinancialRAG
+import contextvars
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+from backend.config import GEMINI_API_KEY, GEMINI_MODEL, EMBED_BATCH_SIZE, EVIDENCE_CHUNKS
+from backend.utils.rag import FinancialRAG, interleave, make_embedding_function
+from backend.utils.chunker import ReportChunker
+from backend.utils.result_cache import ResultCache
 from backend.utils.pdf_parser import PDFParser
 from backend.utils.table_extractor import FinancialTableExtractor
 from backend.models.schemas import FundamentalMetrics
-from backend.utils.ai_helper import generate_content_with_retry
+from backend.utils.structured_output import generate_structured
+from backend.utils.context_builder import ContextBuilder, context_budget
+from backend.utils.ai_helper import estimate_tokens
+from backend.utils import metrics
 
 logger = logging.getLogger(__name__)
 
 genai.configure(api_key=GEMINI_API_KEY)
 
+# One targeted retrieval query per metric; "outlook" feeds strengths/concerns
+METRIC_QUERIES = {
+    "revenue_growth": "revenue from operations total income growth compared to previous year",
+    "profit_margin": "net profit for the year profit after tax operating margin",
+    "roe": "return on equity shareholders funds total equity net worth",
+    "debt_to_equity": "borrowings total debt debt to equity ratio leverage",
+    "outlook": "key strengths risks concerns management outlook",
+}
+# Report sections searched per metric; "general" (text before any recognised
+# heading) is always included so reports without clear headings still match
+METRIC_SECTIONS = {
+    "revenue_growth": ["general", "income_statement", "mdna", "directors_report"],
+    "profit_margin": ["general", "income_statement", "mdna", "directors_report"],
+    "roe": ["general", "balance_sheet", "income_statement", "mdna"],
+    "debt_to_equity": ["general", "balance_sheet", "notes", "mdna"],
+    "outlook": ["general", "mdna", "directors_report"],
+}
+# Words in a user question that point at a metric's evidence
+METRIC_KEYWORDS = {
+    "revenue_growth": ("revenue", "sales", "turnover", "growth", "income"),
+    "profit_margin": ("profit", "margin", "earnings", "pat", "ebitda"),
+    "roe": ("roe", "return on equity", "net worth", "equity"),
+    "debt_to_equity": ("debt", "borrowing", "leverage", "loan", "d/e"),
+    "outlook": ("strength", "risk", "concern", "outlook", "guidance", "future", "plan"),
+}
+
+def metrics_for_question(question: str) -> list:
+    """Metrics whose evidence is likely relevant to a free-form question."""
+    lowered = question.lower()
+    return [name for name, words in METRIC_KEYWORDS.items() if any(w in lowered for w in words)]
+
 class FundamentalAnalyzer:
-    def __init__(self):
-        self.rag = FinancialRAG()
+    def __init__(self, rag: FinancialRAG = None, metrics_store: Optional[ResultCache] = None):
+        self.rag = rag or FinancialRAG()
+        # Statement metrics per doc_id, so reports that are already indexed keep them
+        self.metrics_store = metrics_store
         self.pdf_parser = PDFParser
         self.table_extractor = FinancialTableExtractor()
+        self.context_builder = ContextBuilder(context_budget(GEMINI_MODEL))
 
-    def process_and_store(self, pdf_path: str, company_name: str, report_type: str, job_id: str):
-        # Extract Text
+    def process_and_store(self, pdf_path: str, company_name: str, report_type: str, doc_id: str) -> Optional[Dict[str, float]]:
+        """
+        Embeds the report and returns the metrics computed deterministically from its
+        financial statement tables.
+        """
+        # Identical report already embedded for this company -> only its metrics are needed
+        known = self.indexed_metrics(pdf_path, doc_id)
+        if known is not None:
+            return known
+
+        # Single pass: text is streamed into the RAG store (early pages are embedded while
+        # later ones are still being parsed) and tables are collected on the way
         parser = self.pdf_parser(pdf_path)
-        text = parser.extract_text()
-        
-        # Store in RAG
-        self.rag.add_document(text, company_name, report_type, job_id)
-        
-        # Tables (optional for now, can add to context later)
-        # tables = parser.extract_tables()
-        # id_tables = self.table_extractor.identify_financial_tables(tables)
-
-    def analyze(self, company_name: str) -> FundamentalMetrics:
-        print(f"\n[Fundamental Analyzer] Starting RAG extraction for {company_name}...")
-        # Retrieve Context
-        context = self.rag.query_context(
-            f"What are the revenue growth, profit margin, ROE, debt to equity, and key strengths/concerns for {company_name}?",
-            company_name
+        tables = []
+
+        def report_pages():
+            pages = metrics.timed_iter(parser.iter_pages(include_tables=True), "pdf_parse", metrics.PDF_PARSE_SECONDS)
+            for page in pages:
+                for t_idx, table_data in enumerate(page['tables']):
+                    tables.append({'page': page['page'], 'table_index': t_idx, 'data': table_data})
+                yield page
+
+        self.rag.add_pages(report_pages(), company_name, report_type, doc_id)
+
+        statements = self.table_extractor.identify_financial_tables(tables)
+        table_metrics = self.table_extractor.compute_metrics(statements)
+        print(f"[Fundamental Analyzer] Metrics from {len(tables)} tables: {table_metrics}")
+        self.remember_metrics(doc_id, table_metrics)
+        return table_metrics
+
+    def remember_metrics(self, doc_id: str, table_metrics: Dict[str, float]):
+        if self.metrics_store is not None:
+            self.metrics_store.put_statement_metrics(doc_id, table_metrics)
+
+    def indexed_metrics(self, pdf_path: str, doc_id: str) -> Optional[Dict[str, float]]:
+        """Statement metrics of a report that is already indexed (None if it isn't)."""
+        if not self.rag.has_document(doc_id):
+            return None
+        table_metrics = self.metrics_store.get_statement_metrics(doc_id) if self.metrics_store else None
+        if table_metrics is None:
+            # Indexed before its metrics were stored: parse the tables again, but don't re-embed
+            tables = self.pdf_parser(pdf_path).extract_tables()
+            table_metrics = self.table_extractor.compute_metrics(self.table_extractor.identify_financial_tables(tables))
+            self.remember_metrics(doc_id, table_metrics)
+        print(f"[Fundamental Analyzer] Report {doc_id[:12]} already indexed, skipping ingestion; "
+              f"statement metrics: {table_metrics}")
+        return table_metrics
+
+    @staticmethod
+    def prepare_report(pdf_path: str, company_name: Optional[str] = None, known_ids: Iterable[str] = ()) -> Dict:
+        """
+        CPU-heavy half of ingestion, safe to run in a worker process: parses the PDF,
+        splits it, embeds the chunks and computes statement metrics. Batches are embedded
+        on a second thread while later pages are still being parsed. Given the company,
+        chunks whose ids are in `known_ids` (already stored) or repeat within the report
+        are dropped before embedding. Touches no shared store; `store_prepared` writes
+        the result from the owning process.
+        """
+        chunker = ReportChunker()
+        embed = make_embedding_function()
+        extractor = FinancialTableExtractor()
+
+        tables = []
+
+        def report_pages():
+            for page in PDFParser(pdf_path).iter_pages(include_tables=True):
+                for t_idx, table_data in enumerate(page['tables']):
+                    tables.append({'page': page['page'], 'table_index': t_idx, 'data': table_data})
+                yield page
+
+        skip = set(known_ids)
+        kept, vectors = [], []
+        duplicates = 0
+        in_flight = deque()
+        pool = ThreadPoolExecutor(max_workers=1)
+
+        def embed_batch(texts):
+            with metrics.span("embed"):
+                return embed(texts)
+
+        def collect_one():
+            batch, future = in_flight.popleft()
+            kept.extend(batch)
+            vectors.extend(future.result())
+
+        def submit(batch):
+            # Run in this context so embedding time lands in the timings below
+            future = pool.submit(contextvars.copy_context().run, embed_batch, [c["text"] for c in batch])
+            in_flight.append((batch, future))
+            # Bound memory: one batch embedding while the next one is parsed
+            while len(in_flight) > 1:
+                collect_one()
+
+        with metrics.track_job() as timings:
+            try:
+                batch = []
+                # Section state carries across pages, so the whole stream goes through one chunker pass
+                for chunk in metrics.timed_iter(chunker.iter_chunks(report_pages()), "pdf_parse"):
+                    if company_name is not None:
+                        cid = FinancialRAG.chunk_id(company_name, chunk["text"])
+                        if cid in skip:
+                            duplicates += 1
+                            continue
+                        skip.add(cid)
+                    batch.append(chunk)
+                    if len(batch) >= EMBED_BATCH_SIZE:
+                        submit(batch)
+                        batch = []
+                if batch:
+                    submit(batch)
+                while in_flight:
+                    collect_one()
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+        matrix = np.asarray(vectors, dtype=np.float32)
+
+        return {
+            "chunks": kept,
+            "duplicates": duplicates,
+            "embeddings": base64.b64encode(matrix.tobytes()).decode("ascii"),
+            "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            "table_metrics": extractor.compute_metrics(extractor.identify_financial_tables(tables)),
+            # Measured in the worker; reported by `store_prepared` in the owning process
+            "timings": {"pdf_parse": timings.get("pdf_parse", 0.0), "embed": timings.get("embed", 0.0)},
+        }
+
+    def store_prepared(self, prepared: Dict, company_name: str, report_type: str, doc_id: str) -> Dict[str, float]:
+        """Stores the output of `prepare_report` and returns its statement metrics."""
+        chunks = prepared["chunks"]
+        timings = prepared.get("timings", {})
+        if "pdf_parse" in timings:
+            metrics.PDF_PARSE_SECONDS.observe(timings["pdf_parse"])
+        for name, seconds in timings.items():
+            metrics.record(name, seconds)
+        if chunks:
+            matrix = np.frombuffer(base64.b64decode(prepared["embeddings"]), dtype=np.float32)
+            matrix = matrix.reshape(len(chunks), prepared["dim"])
+            self.rag.add_chunks(chunks, company_name, report_type, doc_id, embeddings=list(matrix))
+        table_metrics = prepared["table_metrics"]
+        self.remember_metrics(doc_id, table_metrics)
+        print(f"[Fundamental Analyzer] Stored {len(chunks)} prepared chunks "
+              f"({prepared.get('duplicates', 0)} duplicates not embedded); statement metrics: {table_metrics}")
+        return table_metrics
+
+    def score_metrics(self, m: Dict[str, float]) -> FundamentalMetrics:
+        """Rule-based health score, strengths and concerns when all four metrics are known."""
+        score = 5
+        strengths, concerns = [], []
+
+        if m['revenue_growth'] >= 15:
+            score += 2
+            strengths.append(f"Strong revenue growth of {m['revenue_growth']}%")
+        elif m['revenue_growth'] >= 5:
+            score += 1
+            strengths.append(f"Steady revenue growth of {m['revenue_growth']}%")
+        elif m['revenue_growth'] < 0:
+            score -= 2
+            concerns.append(f"Revenue declined {abs(m['revenue_growth'])}% year on year")
+
+        if m['profit_margin'] >= 15:
+            score += 1
+            strengths.append(f"High profit margin of {m['profit_margin']}%")
+        elif m['profit_margin'] < 0:
+            score -= 2
+            concerns.append("Loss-making at the net level")
+        elif m['profit_margin'] < 5:
+            concerns.append(f"Thin profit margin of {m['profit_margin']}%")
+
+        if m['roe'] >= 15:
+            score += 1
+            strengths.append(f"ROE of {m['roe']}% indicates efficient use of equity")
+        elif m['roe'] < 8:
+            score -= 1
+            concerns.append(f"Low ROE of {m['roe']}%")
+
+        if m['debt_to_equity'] <= 0.5:
+            score += 1
+            strengths.append(f"Conservative leverage (D/E {m['debt_to_equity']})")
+        elif m['debt_to_equity'] > 1.5:
+            score -= 2
+            concerns.append(f"High leverage (D/E {m['debt_to_equity']})")
+        elif m['debt_to_equity'] > 1:
+            score -= 1
+            concerns.append(f"Elevated leverage (D/E {m['debt_to_equity']})")
+
+        return FundamentalMetrics(
+            revenue_growth=m['revenue_growth'], profit_margin=m['profit_margin'],
+            roe=m['roe'], debt_to_equity=m['debt_to_equity'],
+            health_score=max(0, min(10, score)), strengths=strengths, concerns=concerns
         )
-        print(f"[Fundamental Analyzer] Retrieved {len(context)} characters of context.")
+
+    def retrieve_evidence(self, company_name: str, names: Optional[list] = None) -> Dict[str, list]:
+        """Per-metric chunks for `names` (default: all metrics), from one batched retrieval call."""
+        names = names if names is not None else list(METRIC_QUERIES)
+        questions = {name: f"{company_name} {METRIC_QUERIES[name]}" for name in names}
+        return self.rag.query_many(questions, company_name, n_results=EVIDENCE_CHUNKS,
+                                   sections={name: METRIC_SECTIONS[name] for name in names})
+
+    def analyze(self, company_name: str, table_metrics: Optional[Dict[str, float]] = None,
+                evidence: Optional[Dict[str, list]] = None) -> FundamentalMetrics:
+        """
+        `evidence`, if given, is filled with the chunk ids retrieved per metric
+        (kept on the job so Q&A can reuse them).
+        """
+        table_metrics = table_metrics or {}
+        # Batched per-metric retrieval is one round trip, so evidence is gathered
+        # even when the statements already answer every metric
+        per_metric = self.retrieve_evidence(company_name)
+        if evidence is not None:
+            evidence.update({name: [c["id"] for c in chunks] for name, chunks in per_metric.items()})
+
+        if all(k in table_metrics for k in ("revenue_growth", "profit_margin", "roe", "debt_to_equity")):
+            print(f"[Fundamental Analyzer] All metrics computed from statements; skipping LLM for {company_name}.")
+            return self.score_metrics(table_metrics)
+
+        print(f"\n[Fundamental Analyzer] Starting RAG extraction for {company_name}...")
+        # Metrics already computed from the statements need no context
+        wanted = [name for name in METRIC_QUERIES if name not in table_metrics]
+        chunks = interleave(per_metric[name] for name in wanted)
+        context = self.context_builder.build(chunks)
+        print(f"[Fundamental Analyzer] Packed {len(chunks)} chunks for {wanted} into ~{estimate_tokens(context)} tokens of context.")
 
         # Knowledge Fallback Logic
         if not context or len(context) < 100:
@@ -70,7 +317,7 @@ class FundamentalAnalyzer:
         else:
             prompt = f"""
             Analyze the fundamentals of {company_name} based on this context:
-            {context[:15000]} # Limit context window
+            {context}
 
             Extract logical conservative estimates. 
             CRITICAL: If a specific percentage is not found, ESTIMATE it based on the text or trends described. Do NOT return 0 unless the report explicitly says 0.
@@ -88,18 +335,22 @@ class FundamentalAnalyzer:
             }}
             """
 
+        if table_metrics:
+            prompt += f"""
+            These figures were computed from the financial statements; use them exactly: {json.dumps(table_metrics)}
+            """
+
         try:
             print("[Fundamental Analyzer] Asking Gemini to extract metrics...")
-            model_flash = genai.GenerativeModel('models/gemma-3-27b-it')
-            response = generate_content_with_retry(model_flash, prompt)
-            print(f"[Fundamental Analyzer] Gemini Response:\n{response.text}")
-            data = json.loads(response.text.replace("```json", "").replace("```", ""))
-            return FundamentalMetrics(**data)
+            # Statement-derived figures win over whatever the model extracted
+            result = generate_structured(prompt, FundamentalMetrics, agent="fundamentals", overrides=table_metrics)
+            print(f"[Fundamental Analyzer] Gemini Response:\n{result.model_dump_json()}")
+            return result
         except Exception as e:
             print(f"!!! [Fundamental Analyzer] ERROR: {e}")
             logger.error(f"Fundamental Analysis failed: {e}")
             # Fallback
             return FundamentalMetrics(
                 revenue_growth=0, profit_margin=0, roe=0, debt_to_equity=0,
-                health_score=0, strengths=[f"Error: {str(e)}"], concerns=[]
+                health_score=0, strengths=[f"Error: {str(e)}"], concerns=[], degraded=True
             )
@@ -1,24 +1,32 @@
 import google.generativeai as genai
-import json
+import asyncio
 import logging
 from typing import Dict, List
 from backend.config import GEMINI_API_KEY
 from backend.utils.api_clients import NewsAggregator
 from backend.models.schemas import NewsSentiment
-from backend.utils.ai_helper import generate_content_with_retry
+from backend.utils.structured_output import agenerate_structured
+from backend.utils.rag import make_embedding_function
+from backend.utils.sentiment import NewsSentimentScorer
 
 logger = logging.getLogger(__name__)
 
 # Configure Gemini
 genai.configure(api_key=GEMINI_API_KEY)
 
+def panic_from_counts(positive: int, negative: int, neutral: int) -> str:
+    total = positive + negative + neutral
+    share = negative / total if total else 0
+    return "high" if share >= 0.5 else "medium" if share >= 0.3 else "low"
+
 class NewsAnalyzer:
-    def __init__(self):
+    def __init__(self, embed_fn=None):
         self.aggregator = NewsAggregator()
+        self.scorer = NewsSentimentScorer(embed_fn or make_embedding_function())
 
-    def analyze(self, company_name: str) -> NewsSentiment:
-        # 1. Fetch News
-        articles = self.aggregator.fetch_news(company_name)
+    async def analyze(self, company_name: str) -> NewsSentiment:
+        # 1. Fetch News (all sources concurrently, cached per company)
+        articles = await self.aggregator.fetch_news(company_name)
         
         if not articles:
             # Return neutral fallback if no news
@@ -27,53 +35,62 @@ class NewsAnalyzer:
                 key_themes=["No recent news found"], headlines=[], panic_level="low"
             )
 
-        # 2. Prepare Prompt
-        print(f"\n[News Analyzer] Fetched {len(articles)} articles. Top headlines:")
-        for a in articles[:3]:
+        # 2. Score locally: counts are deterministic, duplicates collapse into stories
+        local = await asyncio.to_thread(self.scorer.score, articles)
+        representatives = local["representatives"]
+        print(f"\n[News Analyzer] {len(articles)} articles -> {local['stories']} stories "
+              f"(+{local['positive_count']} / -{local['negative_count']} / ={local['neutral_count']}, "
+              f"local score {local['score']}). Top headlines:")
+        for a in representatives[:3]:
             print(f" - {a['title']}")
 
-        articles_text = "\n".join([f"- {a['title']} ({a['source']}): {a['description']}" for a in articles[:15]])
+        headlines = [a['title'] for a in representatives[:5]]
+        articles_text = "\n".join([
+            f"- [{a['label']}, {a['coverage']} outlets] {a['title']} ({a['source']}): {a['description']}"
+            for a in representatives
+        ])
         
         prompt = f"""
         Analyze the news sentiment for {company_name}.
+        {len(articles)} recent articles were grouped into {local['stories']} distinct stories:
+        {local['positive_count']} positive, {local['negative_count']} negative, {local['neutral_count']} neutral.
         
-        Articles:
+        Representative story per group (pre-labelled, with how many outlets covered it):
         {articles_text}
         
         Return a JSON object with this EXACT structure (no markdown):
         {{
             "score": <int, -10 to 10>,
-            "positive_count": <int>,
-            "negative_count": <int>,
-            "neutral_count": <int>,
             "key_themes": [<list of strings>],
-            "headlines": [<list of top 5 headlines as strings>],
             "panic_level": "<low|medium|high>"
         }}
         """
 
-        # 3. Call Gemini
+        # 3. Call Gemini for the qualitative part only
         try:
             print("[News Analyzer] Sending prompt to Gemini...")
-            
-            # Print top 5 headlines for debugging as requested
-            print("\n[DEBUG] Top 5 Headlines Sent to AI:")
-            print(articles_text.split('\n')[:5])
-            
-            model_flash = genai.GenerativeModel('models/gemma-3-27b-it')
-            response = generate_content_with_retry(model_flash, prompt)
-            print(f"[News Analyzer] Gemini Response:\n{response.text}")
-            text = response.text.strip()
-            # Clean markdown if present
-            if text.startswith("```json"):
-                text = text[7:-3]
-            
-            data = json.loads(text)
-            return NewsSentiment(**data)
+            sentiment = await agenerate_structured(
+                prompt, NewsSentiment, agent="news",
+                defaults={"score": local["score"], "key_themes": [], "panic_level": "low"},
+                overrides={
+                    "positive_count": local["positive_count"],
+                    "negative_count": local["negative_count"],
+                    "neutral_count": local["neutral_count"],
+                    "headlines": headlines,
+                },
+            )
+            print(f"[News Analyzer] Gemini Response:\n{sentiment.model_dump_json()}")
+            return sentiment
         except Exception as e:
             print(f"!!! [News Analyzer] ERROR: {e}")
             logger.error(f"News Analysis failed: {e}")
+            # The local scores still stand without the LLM
             return NewsSentiment(
-                score=0, positive_count=0, negative_count=0, neutral_count=0,
-                key_themes=[f"Error: {str(e)}"], headlines=[], panic_level="low"
+                score=local["score"],
+                positive_count=local["positive_count"],
+                negative_count=local["negative_count"],
+                neutral_count=local["neutral_count"],
+                key_themes=[f"Error: {str(e)}"], headlines=headlines,
+                panic_level=panic_from_counts(local["positive_count"], local["negative_count"], local["neutral_count"]),
+                degraded=True
             )
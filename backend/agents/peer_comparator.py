@@ -2,15 +2,41 @@ import google.generativeai as genai
 import json
 import os
 import logging
-from backend.config import GEMINI_API_KEY
+import numpy as np
+from typing import Dict
+from backend.config import GEMINI_API_KEY, PEER_LLM_NARRATIVE
 from backend.models.schemas import PeerComparison, FundamentalMetrics
-from backend.utils.ai_helper import generate_content_with_retry
+from backend.utils.ai_helper import generate_content_with_retry, get_model
+from backend.utils.peer_store import PeerIndex, PeerStore
 
 logger = logging.getLogger(__name__)
 genai.configure(api_key=GEMINI_API_KEY)
 
+# Metrics ranked against peers; +1 = higher is better, -1 = lower is better
+RANKED_METRICS = {
+    "revenue_growth": 1,
+    "profit_margin": 1,
+    "roe": 1,
+    "debt_to_equity": -1,
+    "health_score": 1,
+}
+
+def percentile_ranks(target: np.ndarray, peers: np.ndarray) -> np.ndarray:
+    """
+    Per-metric percentile (0-1) of the target within the peer set, ties counted
+    as half. `target` is (m,), `peers` is (n, m); metrics must already be
+    oriented so that higher is better.
+    """
+    below = (peers < target).sum(axis=0)
+    equal = (peers == target).sum(axis=0)
+    return (below + 0.5 * equal) / peers.shape[0]
+
+def is_usable(metrics: FundamentalMetrics) -> bool:
+    # Failed analyses fall back to all-zero metrics; don't let them pollute the peer set
+    return any([metrics.revenue_growth, metrics.profit_margin, metrics.roe, metrics.debt_to_equity])
+
 class PeerComparator:
-    def __init__(self):
+    def __init__(self, store: PeerStore = None, narrative: bool = PEER_LLM_NARRATIVE):
         # Load peer groups
         try:
             path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'peer_groups.json')
@@ -18,61 +44,81 @@ class PeerComparator:
                 self.peer_groups = json.load(f)
         except Exception:
             self.peer_groups = {}
+        self.index = PeerIndex(self.peer_groups)
+        self.store = store or PeerStore()
+        self.narrative = narrative
 
     def get_peers(self, company_name: str):
-        # Simple lookup
-        for key, peers in self.peer_groups.items():
-            if key.lower() in company_name.lower():
-                return peers
-        return []
+        return self.index.peers_for(company_name)
+
+    def record(self, company_name: str, metrics: FundamentalMetrics, report_type: str):
+        """Adds an analyzed company's metrics to the peer store."""
+        if is_usable(metrics):
+            self.store.upsert(company_name, metrics, report_type)
+
+    def rank(self, target_metrics: FundamentalMetrics, peer_metrics: Dict[str, FundamentalMetrics]) -> Dict[str, float]:
+        """Percentile of the target for each ranked metric across the peer set."""
+        signs = np.array(list(RANKED_METRICS.values()), dtype=float)
+        target = np.array([getattr(target_metrics, k) for k in RANKED_METRICS], dtype=float) * signs
+        peers = np.array([[getattr(m, k) for k in RANKED_METRICS] for m in peer_metrics.values()], dtype=float) * signs
+        return dict(zip(RANKED_METRICS, percentile_ranks(target, peers).round(3).tolist()))
 
     def analyze(self, company_name: str, target_metrics: FundamentalMetrics) -> PeerComparison:
         peers = self.get_peers(company_name)
-        print(f"\n[Peer Comparator] Comparing {company_name} with: {peers}")
-        
-        # MOCKED PEER DATA FOR HACKATHON
-        # In real app, we would fetch/analyze peer reports
-        peer_metrics_map = {}
-        for p in peers:
-            # Generate plausible variance from target
-            peer_metrics_map[p] = FundamentalMetrics(
-                revenue_growth=target_metrics.revenue_growth * 0.9, 
-                profit_margin=target_metrics.profit_margin * 0.95,
-                roe=target_metrics.roe * 0.9,
-                debt_to_equity=target_metrics.debt_to_equity * 1.1,
-                health_score=max(0, target_metrics.health_score - 1),
-                strengths=[], concerns=[]
-            )
+        peer_metrics_map = self.store.get_many(peers)
+        print(f"\n[Peer Comparator] Comparing {company_name} with: {peers} "
+              f"({len(peer_metrics_map)} with stored metrics)")
+
+        if peer_metrics_map:
+            ranks = self.rank(target_metrics, peer_metrics_map)
+            overall = float(np.mean(list(ranks.values())))
+            relative_strength = int(round(overall * 10))
+            best = max(ranks, key=ranks.get)
+            worst = min(ranks, key=ranks.get)
+            summary = (f"Average percentile rank of {overall:.0%} across {len(peer_metrics_map)} peers; "
+                       f"strongest on {best.replace('_', ' ')}, weakest on {worst.replace('_', ' ')}.")
+        else:
+            # No analyzed peers yet: fall back to the absolute health score
+            ranks = {}
+            relative_strength = target_metrics.health_score
+            summary = "No peer reports analyzed yet; position reflects the standalone health score."
 
+        if relative_strength >= 7:
+            position = "leader"
+        elif relative_strength <= 3:
+            position = "laggard"
+        else:
+            position = "average"
+
+        if self.narrative and peer_metrics_map:
+            summary = self.narrate(company_name, target_metrics, peer_metrics_map, ranks) or summary
+
+        return PeerComparison(
+            competitive_position=position,
+            relative_strength=relative_strength,
+            peer_metrics=peer_metrics_map,
+            summary=summary
+        )
+
+    def narrate(self, company_name: str, target_metrics: FundamentalMetrics,
+                peer_metrics: Dict[str, FundamentalMetrics], ranks: Dict[str, float]) -> str:
+        """Optional LLM commentary on top of the computed ranking."""
         prompt = f"""
-        Compare {company_name} with its peers: {', '.join(peers)}.
-        
-        Target Metrics: {target_metrics.model_dump_json()}
-        Peer Metrics (simulated): {json.dumps({k: v.model_dump() for k, v in peer_metrics_map.items()})}
-
-        Return JSON:
-        {{
-            "competitive_position": "<leader|average|laggard>",
-            "relative_strength": <int, 0-10>,
-            "summary": "Brief comparison summary"
-        }}
+        Compare {company_name} with its peers: {', '.join(peer_metrics)}.
+
+        Target Metrics: {target_metrics.model_dump_json(exclude={'strengths', 'concerns'})}
+        Peer Metrics: {json.dumps({k: v.model_dump(exclude={'strengths', 'concerns'}) for k, v in peer_metrics.items()})}
+        Target percentile per metric (1.0 = best in group): {json.dumps(ranks)}
+
+        Write a brief (2-3 sentence) comparison summary. Plain text, no markdown.
         """
 
         try:
             print(f"[Peer Comparator] Sending comparison prompt...")
-            model_flash = genai.GenerativeModel('models/gemma-3-27b-it')
-            response = generate_content_with_retry(model_flash, prompt)
-            print(f"[Peer Comparator] Gemini Response:\n{response.text}")
-            data = json.loads(response.text.replace("```json", "").replace("```", ""))
-            
-            return PeerComparison(
-                competitive_position=data['competitive_position'],
-                relative_strength=data['relative_strength'],
-                peer_metrics=peer_metrics_map
-            )
+            model_flash = get_model()
+            response = generate_content_with_retry(model_flash, prompt, agent="peers")
+            return response.text.strip()
         except Exception as e:
             print(f"!!! [Peer Comparator] ERROR: {e}")
-            logger.error(f"Peer Compare failed: {e}")
-            return PeerComparison(
-                competitive_position="average", relative_strength=5, peer_metrics={}
-            )
+            logger.error(f"Peer narrative failed: {e}")
+            return None
@@ -1,9 +1,8 @@
 import google.generativeai as genai
-import json
 import logging
 from backend.config import GEMINI_API_KEY
 from backend.models.schemas import ContrarianSignal, NewsSentiment, FundamentalMetrics, PeerComparison
-from backend.utils.ai_helper import generate_content_with_retry
+from backend.utils.structured_output import generate_structured
 
 logger = logging.getLogger(__name__)
 genai.configure(api_key=GEMINI_API_KEY)
@@ -42,11 +41,9 @@ class SignalGenerator:
 
         try:
             print(f"\n[Signal Generator] Synthesizing final signal...")
-            model_flash = genai.GenerativeModel('models/gemma-3-27b-it')
-            response = generate_content_with_retry(model_flash, prompt)
-            print(f"[Signal Generator] Gemini Final Decision:\n{response.text}")
-            data = json.loads(response.text.replace("```json", "").replace("```", ""))
-            return ContrarianSignal(**data)
+            signal = generate_structured(prompt, ContrarianSignal, agent="signal")
+            print(f"[Signal Generator] Gemini Final Decision:\n{signal.model_dump_json()}")
+            return signal
         except Exception as e:
             print(f"!!! [Signal Generator] ERROR: {e}")
             logger.error(f"Signal Gen failed: {e}")
@@ -54,5 +51,5 @@ class SignalGenerator:
                 signal_type="Hold", signal_strength=5, confidence="Low",
                 summary=f"Analysis failed: {str(e)}", opportunity_reasons=[], risk_factors=[],
                 management_outlook="Unknown", future_development="Unknown",
-                timeframe="Unknown", entry_strategy="Wait"
+                timeframe="Unknown", entry_strategy="Wait", degraded=True
             )
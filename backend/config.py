@@ -8,8 +8,11 @@ UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 STATIC_DIR = os.path.join(BASE_DIR, "frontend", "static")
 TEMPLATES_DIR = os.path.join(BASE_DIR, "frontend", "templates")
 
-# Creates upload dir if not exists
+STORAGE_DIR = os.path.join(BASE_DIR, "storage")
+
+# Creates upload/storage dirs if not exists
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(STORAGE_DIR, exist_ok=True)
 
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -18,3 +21,110 @@ if not NEWS_API_KEY:
     print("WARNING: NEWS_API_KEY not found in .env")
 if not GEMINI_API_KEY:
     print("WARNING: GEMINI_API_KEY not found in .env")
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/gemma-3-27b-it")
+
+# LLM gateway (shared across all agents in this process)
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "15"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "15000"))  # 0 disables the token bucket
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "2"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+
+# Job store ("sqlite" works across worker processes, "memory" is single-process only)
+JOB_STORE = os.getenv("JOB_STORE", "sqlite")
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(STORAGE_DIR, "jobs.db"))
+JOB_CACHE_SIZE = int(os.getenv("JOB_CACHE_SIZE", "256"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))
+
+# Analysis result cache (keyed by report file hash + company + report type)
+RESULT_CACHE_DB_PATH = os.getenv("RESULT_CACHE_DB_PATH", os.path.join(STORAGE_DIR, "cache.db"))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+NEWS_CACHE_TTL_SECONDS = int(os.getenv("NEWS_CACHE_TTL_SECONDS", "3600"))
+
+# News fetching
+NEWS_FETCH_TTL_SECONDS = int(os.getenv("NEWS_FETCH_TTL_SECONDS", "900"))  # raw articles cached per company query
+NEWS_API_TIMEOUT = float(os.getenv("NEWS_API_TIMEOUT", "8"))
+NEWS_RSS_TIMEOUT = float(os.getenv("NEWS_RSS_TIMEOUT", "6"))
+NEWS_MAX_ARTICLES = int(os.getenv("NEWS_MAX_ARTICLES", "40"))
+NEWS_CACHE_SIZE = int(os.getenv("NEWS_CACHE_SIZE", "500"))  # company queries kept (articles and feed validators)
+# Comma-separated feed URLs; "{query}" is replaced with the URL-encoded company name
+NEWS_RSS_FEEDS = [u.strip() for u in os.getenv(
+    "NEWS_RSS_FEEDS", "https://news.google.com/rss/search?q={query}+when:7d&hl=en-US&gl=US&ceid=US:en"
+).split(",") if u.strip()]
+
+# Local news pre-scoring
+SENTIMENT_MARGIN = float(os.getenv("SENTIMENT_MARGIN", "0.03"))  # min polarity gap before an article counts as +/-
+NEWS_DUPLICATE_THRESHOLD = float(os.getenv("NEWS_DUPLICATE_THRESHOLD", "0.9"))
+NEWS_MAX_REPRESENTATIVES = int(os.getenv("NEWS_MAX_REPRESENTATIVES", "10"))  # stories sent to the LLM
+
+# Peer comparison
+PEER_DB_PATH = os.getenv("PEER_DB_PATH", os.path.join(STORAGE_DIR, "peers.db"))
+PEER_LLM_NARRATIVE = os.getenv("PEER_LLM_NARRATIVE", "false").lower() in ("1", "true", "yes")
+
+# PDF extraction
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "50"))  # smaller docs parse in-process
+
+# Embedding / RAG ingestion
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))  # 0 embeds inline on the ingest thread
+# Empty uses Chroma's default ONNX MiniLM; changing it requires a fresh chroma_db
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "")
+
+# Retrieval
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))  # per retriever, before fusion
+RERANK_MODEL = os.getenv("RERANK_MODEL", "")  # e.g. cross-encoder/ms-marco-MiniLM-L-6-v2; empty disables reranking
+
+# Prompt context: estimated tokens of retrieved text packed into one prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# Per-model overrides, e.g. "models/gemini-2.0-flash=8000"
+CONTEXT_TOKEN_BUDGETS = {}
+for _pair in os.getenv("CONTEXT_TOKEN_BUDGETS", "").split(","):
+    if "=" in _pair:
+        _model, _budget = _pair.rsplit("=", 1)
+        CONTEXT_TOKEN_BUDGETS[_model.strip()] = int(_budget)
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "8"))  # chunks retrieved before packing
+EVIDENCE_CHUNKS = int(os.getenv("EVIDENCE_CHUNKS", "3"))  # chunks kept per fundamentals metric
+
+# Progress streaming: how often an SSE stream re-reads the job store when no local event arrived
+SSE_STORE_POLL_SECONDS = float(os.getenv("SSE_STORE_POLL_SECONDS", "3"))
+
+# Uploads
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "100")) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_MB", "2048")) * 1024 * 1024  # whole /api/batch request
+
+# Worker pool for CPU-heavy stages ("embedded" spawns workers with the app,
+# "external" expects `python -m backend.worker`, "inline" runs in the web process)
+WORKER_MODE = os.getenv("WORKER_MODE", "embedded")
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+QUEUE_DB_PATH = os.getenv("QUEUE_DB_PATH", os.path.join(STORAGE_DIR, "queue.db"))
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", "20"))
+TASK_TIMEOUT_SECONDS = int(os.getenv("TASK_TIMEOUT_SECONDS", "1800"))
+WORKER_SUPERVISE_SECONDS = float(os.getenv("WORKER_SUPERVISE_SECONDS", "5"))  # embedded worker liveness check
+
+# Q&A semantic answer cache (per process)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "200"))  # answers kept per company
+
+# Batch screening (/api/batch)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))  # analyses in flight per batch request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+# LLM prompt/response cache (shared on disk by all agents and processes)
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", os.path.join(STORAGE_DIR, "llm_cache.db"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_DEFAULT_TTL = int(os.getenv("LLM_CACHE_DEFAULT_TTL", str(24 * 3600)))
+# Per-agent TTLs in seconds, e.g. "news=3600,signal=21600"; 0 disables caching for that agent
+LLM_CACHE_TTLS = {
+    "news": 3600,
+    "fundamentals": 7 * 24 * 3600,
+    "peers": 7 * 24 * 3600,
+    "signal": 6 * 3600,
+}
+for _pair in os.getenv("LLM_CACHE_TTLS", "").split(","):
+    if "=" in _pair:
+        _agent, _ttl = _pair.split("=", 1)
+        LLM_CACHE_TTLS[_agent.strip()] = int(_ttl)
@@ -1,27 +1,47 @@
 import os
+import time
 import uuid
 import logging
 import asyncio
+import json
 from datetime import datetime
+from typing import Dict, List, Optional
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-from backend.config import UPLOAD_DIR, STATIC_DIR, TEMPLATES_DIR
+from backend.config import (
+    UPLOAD_DIR, STATIC_DIR, TEMPLATES_DIR, SSE_STORE_POLL_SECONDS,
+    WORKER_MODE, WORKER_CONCURRENCY, WORKER_SUPERVISE_SECONDS, MAX_QUEUE_DEPTH,
+    BATCH_CONCURRENCY, BATCH_MAX_ITEMS, MAX_BATCH_UPLOAD_BYTES,
+    GEMINI_MODEL, CONTEXT_CANDIDATES
+)
 from backend.models.schemas import (
     AnalysisRequest, JobStatus, AnalysisResult, 
     NewsSentiment, FundamentalMetrics, PeerComparison, ContrarianSignal,
     QuestionRequest, QuestionResponse
 )
 from backend.agents.news_analyzer import NewsAnalyzer
-from backend.agents.fundamental_analyzer import FundamentalAnalyzer
+from backend.agents.fundamental_analyzer import FundamentalAnalyzer, metrics_for_question
 from backend.agents.peer_comparator import PeerComparator
 from backend.agents.signal_generator import SignalGenerator
-from backend.utils.rag import FinancialRAG
+from backend.utils.rag import FinancialRAG, interleave
+from backend.utils.pipeline import AnalysisPipeline, PipelineProgress, Stage
+from backend.utils.ai_helper import llm_gateway, PRIORITY_INTERACTIVE
+from backend.utils.job_store import create_job_store
+from backend.utils.result_cache import CachedAnalysis, ResultCache, report_key
+from backend.utils.events import JobEventBus, status_event
+from backend.utils.uploads import UploadLimitMiddleware, UploadRejected, save_upload
+from backend.utils.task_queue import TaskQueue
+from backend.worker import start_worker_pool, stop_worker_pool, respawn_dead_workers
+from backend.utils.answer_cache import SemanticAnswerCache
+from backend.utils.context_builder import ContextBuilder, context_budget
+from backend.utils.chunker import SECTION_LABELS, citation
+from backend.utils import metrics
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO)
@@ -31,22 +51,62 @@ logging.getLogger("chromadb").setLevel(logging.ERROR)
 logger = logging.getLogger(__name__)
 
 # --- Global State ---
-jobs = {}  # In-memory storage: {job_id: JobStatus}
+jobs = create_job_store()  # Shared across worker processes: {job_id: JobStatus}
 agents = {} # Holds agent instances
+services = {} # Shared infrastructure (vector store, ...)
+result_cache = ResultCache()
+job_events = JobEventBus()
+task_queue = TaskQueue()
+_batch_tasks = set()  # Strong refs: the loop keeps only weak ones, and a batch outlives its stream
 
 # --- Lifecycle ---
+def release_worker_tasks(worker_id: str):
+    released = task_queue.release(worker_id)
+    if released:
+        logger.warning(f"Re-queued {released} task(s) held by {worker_id}")
+
+async def supervise_workers(workers):
+    """Respawns embedded workers that died, re-queueing their tasks before the replacement starts."""
+    while True:
+        await asyncio.sleep(WORKER_SUPERVISE_SECONDS)
+        try:
+            await asyncio.to_thread(respawn_dead_workers, workers, release_worker_tasks)
+        except Exception as e:
+            logger.error(f"Worker supervision failed: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    logger.info("Initializing RAG service...")
+    services['rag'] = FinancialRAG()
+    try:
+        await asyncio.to_thread(services['rag'].warm_up)
+    except Exception as e:
+        logger.warning(f"RAG warm-up failed, model will load on first use: {e}")
+    await asyncio.to_thread(services['rag'].migrate_company_keys)
+
     logger.info("Initializing Agents...")
-    agents['news'] = NewsAnalyzer()
-    agents['fundamental'] = FundamentalAnalyzer()
+    agents['news'] = NewsAnalyzer(embed_fn=services['rag'].embedding_function)
+    agents['fundamental'] = FundamentalAnalyzer(rag=services['rag'], metrics_store=result_cache)
     agents['peer'] = PeerComparator()
     agents['signal'] = SignalGenerator()
+    services['answer_cache'] = SemanticAnswerCache(services['rag'].embedding_function)
     logger.info("Agents initialized.")
+    jobs.evict_expired()
+
+    workers = []
+    supervisor = None
+    if WORKER_MODE == "embedded":
+        workers = start_worker_pool(WORKER_CONCURRENCY)
+        supervisor = asyncio.create_task(supervise_workers(workers))
+        logger.info(f"Started {len(workers)} analysis worker processes.")
     yield
     # Shutdown
     logger.info("Shutting down...")
+    if supervisor is not None:
+        supervisor.cancel()
+    stop_worker_pool(workers)
+    await agents['news'].aggregator.aclose()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -58,75 +118,146 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UploadLimitMiddleware, paths=["/api/analyze"])
+app.add_middleware(UploadLimitMiddleware, paths=["/api/batch"], max_bytes=MAX_BATCH_UPLOAD_BYTES)
 
 # --- Static & Templates ---
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
 # --- Background Task ---
-async def process_analysis(job_id: str, company_name: str, report_type: str, file_path: str):
-    try:
-        job = jobs[job_id]
-        job.status = "running"
-        job.progress = 10
-        
-        # 1. News Analysis
-        job.current_step = "news"
-        logger.info(f"Job {job_id}: Starting News Analysis")
-        news_result = agents['news'].analyze(company_name)
-        job.progress = 30
-        
-        import time
-        print("[System] Cooling down for 5 seconds to match rate limits...")
-        time.sleep(5)
-
-        # 2. Fundamental Analysis
-        job.current_step = "fundamentals"
-        logger.info(f"Job {job_id}: Starting Fundamental Analysis")
-        # Process PDF to RAG
-        agents['fundamental'].process_and_store(file_path, company_name, report_type, job_id)
-        # Analyze
-        fund_result = agents['fundamental'].analyze(company_name)
-        job.progress = 60
-
-        print("[System] Cooling down for 5 seconds...")
-        time.sleep(5)
-
-        # 3. Peer Comparison
-        job.current_step = "peers"
-        logger.info(f"Job {job_id}: Starting Peer Comparison")
-        peer_result = agents['peer'].analyze(company_name, fund_result)
-        job.progress = 80
-
-        print("[System] Cooling down for 5 seconds...")
-        time.sleep(5)
-
-        # 4. Signal Generation
-        job.current_step = "signal"
-        logger.info(f"Job {job_id}: Generating Signal")
-        signal_result = agents['signal'].generate_signal(news_result, fund_result, peer_result)
-        job.progress = 95
-
-        # Compile Result
-        final_result = AnalysisResult(
-            company_name=company_name,
-            analysis_date=datetime.now(),
-            news=news_result,
-            fundamentals=fund_result,
-            peers=peer_result,
-            signal=signal_result
-        )
-
-        job.result = final_result
-        job.status = "completed"
-        job.progress = 100
-        job.current_step = "done"
-        logger.info(f"Job {job_id}: Completed")
+_job_save_lock = asyncio.Lock()  # FIFO: saves land in the order updates were made
 
-    except Exception as e:
-        logger.error(f"Job {job_id} failed: {e}")
-        job.status = "failed"
-        job.error = str(e)
+async def update_job(job: JobStatus):
+    """Persists the job off the event loop and pushes a progress delta to live subscribers."""
+    async with _job_save_lock:
+        await asyncio.to_thread(jobs.save, job)
+    job_events.publish(job.job_id, status_event(job))
+
+STEP_ORDER = ["news", "fundamentals", "peers", "signal"]
+
+def build_pipeline(company_name: str, report_type: str, file_path: str, doc_id: str,
+                   evidence: Optional[Dict[str, List[str]]] = None) -> AnalysisPipeline:
+    """
+    News and PDF ingestion have no dependency on each other and run concurrently;
+    peers waits for fundamentals, and the signal waits for everything. `evidence`
+    is filled with the chunk ids the fundamentals stage retrieved per metric.
+    """
+    fundamental = agents['fundamental']
+
+    async def ingest():
+        if WORKER_MODE == "inline":
+            return await asyncio.to_thread(fundamental.process_and_store, file_path, company_name, report_type, doc_id)
+        known = await asyncio.to_thread(fundamental.indexed_metrics, file_path, doc_id)
+        if known is not None:
+            return known
+        # Parsing + embedding run in a worker process; only the store write happens here.
+        # Chunks this company already has are skipped there before embedding.
+        known_ids = await asyncio.to_thread(fundamental.rag.company_chunk_ids, company_name)
+        task_id = await asyncio.to_thread(task_queue.enqueue, "prepare_report", {
+            "pdf_path": file_path, "company_name": company_name, "known_ids": known_ids,
+        })
+        prepared = await task_queue.wait(task_id)
+        return await asyncio.to_thread(fundamental.store_prepared, prepared, company_name, report_type, doc_id)
+
+    async def news():
+        return await agents['news'].analyze(company_name)
+
+    return AnalysisPipeline([
+        Stage("news", news, weight=2),
+        Stage("ingest", ingest, weight=3, step="fundamentals"),
+        Stage("fundamentals", lambda ingest: fundamental.analyze(company_name, table_metrics=ingest, evidence=evidence),
+              depends_on=["ingest"], weight=2),
+        Stage("peers", lambda fundamentals: agents['peer'].analyze(company_name, fundamentals),
+              depends_on=["fundamentals"], weight=2),
+        Stage("signal", lambda news, fundamentals, peers: agents['signal'].generate_signal(news, fundamentals, peers),
+              depends_on=["news", "fundamentals", "peers"], weight=2),
+    ])
+
+async def process_analysis(job_id: str, company_name: str, report_type: str, file_path: str,
+                           cache_key: str, cached: Optional[CachedAnalysis] = None):
+    """
+    Runs the analysis DAG for a job. When `cached` is given (report already analyzed
+    but its news is stale), only news and the signal are recomputed; the cached
+    fundamentals keep their evidence.
+    """
+    job = await asyncio.to_thread(jobs.get, job_id)
+    metrics.JOBS_IN_PROGRESS.inc()
+    start = time.perf_counter()
+    with metrics.track_job() as timings:
+        try:
+            job.status = "running"
+            job.progress = 10
+            job.current_step = STEP_ORDER[0]
+            await update_job(job)
+
+            evidence: Dict[str, List[str]] = {}
+            pipeline = build_pipeline(company_name, report_type, file_path, cache_key, evidence)
+            seed = None
+            if cached:
+                seed = {"ingest": None, "fundamentals": cached.result.fundamentals, "peers": cached.result.peers}
+                evidence.update(cached.evidence)
+            tracker = PipelineProgress(pipeline, STEP_ORDER)
+            stage_started: Dict[str, float] = {}
+
+            async def on_update(stage_name: str, event: str):
+                if event == "started":
+                    stage_started[stage_name] = time.perf_counter()
+                elif event == "finished" and stage_name in stage_started:
+                    elapsed = time.perf_counter() - stage_started.pop(stage_name)
+                    metrics.STAGE_SECONDS.observe(elapsed, stage=stage_name)
+                    metrics.record(f"stage.{stage_name}", elapsed)
+                tracker.record(stage_name, event)
+                job.progress = tracker.progress
+                job.current_step = tracker.current_step
+                await update_job(job)
+                logger.info(f"Job {job_id}: Stage '{stage_name}' {event} ({job.progress}%)")
+
+            results = await pipeline.run(on_update, seed=seed)
+
+            # Compile Result
+            final_result = AnalysisResult(
+                company_name=company_name,
+                analysis_date=datetime.now(),
+                news=results["news"],
+                fundamentals=results["fundamentals"],
+                peers=results["peers"],
+                signal=results["signal"]
+            )
+
+            degraded = [name for name, value in results.items() if getattr(value, "degraded", False)]
+            if degraded:
+                # A fallback (e.g. after a rate limit) must not be served for the cache TTL
+                logger.warning(f"Job {job_id}: degraded stages {degraded}; result not cached")
+            else:
+                await asyncio.to_thread(result_cache.put, cache_key, final_result, report_type, evidence)
+                # This company's numbers become peer data for later analyses
+                await asyncio.to_thread(agents['peer'].record, company_name, final_result.fundamentals, report_type)
+
+            job.result = final_result
+            job.evidence = evidence
+            job.status = "completed"
+            job.progress = 100
+            job.current_step = "done"
+            logger.info(f"Job {job_id}: Completed")
+
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+
+        except asyncio.CancelledError:
+            # Persisted below as failed rather than left "running", which is never evicted
+            job.status = "failed"
+            job.error = "Analysis was cancelled"
+            raise
+
+        finally:
+            metrics.JOBS_IN_PROGRESS.dec()
+            metrics.JOBS_TOTAL.inc(status=job.status)
+            timings["total"] = round(time.perf_counter() - start, 4)
+            job.timings = dict(sorted(timings.items()))
+            await update_job(job)
 
 # --- Routes ---
 
@@ -140,14 +271,15 @@ async def analyze_page(request: Request):
 
 @app.get("/progress/{job_id}")
 async def analyzing_page(request: Request, job_id: str):
-    if job_id not in jobs:
+    if await asyncio.to_thread(jobs.get, job_id) is None:
          # Optionally handle 404, but page might handle it via JS API call
          pass
     return templates.TemplateResponse("progress.html", {"request": request})
 
 @app.get("/results/{job_id}")
 async def results_page(request: Request, job_id: str):
-    if job_id not in jobs or jobs[job_id].status != "completed":
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None or job.status != "completed":
         # In real app, handle gracefully
         pass
     return templates.TemplateResponse("results.html", {"request": request})
@@ -159,23 +291,44 @@ async def start_analysis(
     report_type: str = Form(...),
     main_report: UploadFile = File(...)
 ):
+    # Back-pressure: refuse new work while the worker queue is saturated
+    if WORKER_MODE != "inline" and (await asyncio.to_thread(task_queue.depth))["queued"] >= MAX_QUEUE_DEPTH:
+        raise HTTPException(status_code=503, detail="Analysis queue is full, please retry shortly",
+                            headers={"Retry-After": "30"})
+
     job_id = str(uuid.uuid4())
     
-    # Save file
-    file_ext = os.path.splitext(main_report.filename)[1]
-    file_path = os.path.join(UPLOAD_DIR, f"{job_id}{file_ext}")
-    
-    with open(file_path, "wb") as f:
-        content = await main_report.read()
-        f.write(content)
+    # Save file (streamed to disk, hashed on the way)
+    file_path = os.path.join(UPLOAD_DIR, f"{job_id}.pdf")
+    try:
+        file_hash, _ = await save_upload(main_report, file_path)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    # Same report + company + type analyzed before?
+    cache_key = report_key(file_hash, company_name, report_type)
+    cached = await asyncio.to_thread(result_cache.get, cache_key)
+
+    if cached and cached.news_fresh:
+        logger.info(f"Job {job_id}: Served from result cache ({cache_key[:12]})")
+        os.remove(file_path)
+        await asyncio.to_thread(jobs.save, JobStatus(
+            job_id=job_id,
+            status="completed",
+            progress=100,
+            current_step="done",
+            result=cached.result,
+            evidence=cached.evidence
+        ))
+        return {"job_id": job_id}
 
     # Init Job
-    jobs[job_id] = JobStatus(
+    await asyncio.to_thread(jobs.save, JobStatus(
         job_id=job_id,
         status="queued",
         progress=0,
         current_step="queued"
-    )
+    ))
 
     # Start Task
     background_tasks.add_task(
@@ -183,55 +336,342 @@ async def start_analysis(
         job_id, 
         company_name, 
         report_type, 
-        file_path
+        file_path,
+        cache_key,
+        cached
     )
 
     return {"job_id": job_id}
 
+def batch_line(item: Dict, job: JobStatus, source: str, elapsed: float) -> str:
+    line = {
+        "type": "result",
+        "index": item["index"],
+        "company_name": item["company_name"],
+        "job_id": job.job_id,
+        "status": job.status,
+        "source": source,
+        "elapsed_seconds": round(elapsed, 2),
+        "error": job.error,
+        "result": job.result.model_dump(mode="json") if job.result else None,
+    }
+    return json.dumps(line) + "\n"
+
+@app.post("/api/batch")
+async def start_batch(
+    company_names: List[str] = Form(...),
+    report_types: List[str] = Form(...),
+    reports: List[UploadFile] = File(...)
+):
+    """
+    Screens many companies in one request. Items pair up by position
+    (`company_names[i]`, `report_types[i]`, `reports[i]`; a single report type
+    applies to all). Results stream back as NDJSON in completion order, followed
+    by a summary line with throughput. Every item is also a regular job, so
+    results stay available from /api/status if the client disconnects.
+    """
+    if len(report_types) == 1:
+        report_types = report_types * len(company_names)
+    if not (len(company_names) == len(report_types) == len(reports)):
+        raise HTTPException(status_code=422, detail="company_names, report_types and reports must have the same length")
+    if len(company_names) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+    if WORKER_MODE != "inline" and (await asyncio.to_thread(task_queue.depth))["queued"] >= MAX_QUEUE_DEPTH:
+        raise HTTPException(status_code=503, detail="Analysis queue is full, please retry shortly",
+                            headers={"Retry-After": "30"})
+
+    batch_start = time.perf_counter()
+    items = []
+    for index, (company_name, report_type, upload) in enumerate(zip(company_names, report_types, reports)):
+        job_id = str(uuid.uuid4())
+        item = {"index": index, "company_name": company_name, "report_type": report_type,
+                "job_id": job_id, "file_path": os.path.join(UPLOAD_DIR, f"{job_id}.pdf"),
+                "error": None, "cached": None}
+        try:
+            file_hash, _ = await save_upload(upload, item["file_path"])
+            item["cache_key"] = report_key(file_hash, company_name, report_type)
+            item["cached"] = await asyncio.to_thread(result_cache.get, item["cache_key"])
+        except UploadRejected as e:
+            item["error"] = e.detail
+        items.append(item)
+
+    # Items that can be answered right away: rejected uploads and fresh cache hits
+    immediate = []
+    groups: Dict[str, List[Dict]] = {}
+    for item in items:
+        if item["error"]:
+            job = JobStatus(job_id=item["job_id"], status="failed", progress=0, current_step="failed",
+                            error=item["error"])
+            await asyncio.to_thread(jobs.save, job)
+            immediate.append(batch_line(item, job, "rejected", 0))
+        elif item["cached"] and item["cached"].news_fresh:
+            os.remove(item["file_path"])
+            job = JobStatus(job_id=item["job_id"], status="completed", progress=100, current_step="done",
+                            result=item["cached"].result, evidence=item["cached"].evidence)
+            await asyncio.to_thread(jobs.save, job)
+            immediate.append(batch_line(item, job, "cache", 0))
+        else:
+            await asyncio.to_thread(jobs.save, JobStatus(job_id=item["job_id"], status="queued", progress=0,
+                                                         current_step="queued"))
+            # The same report listed twice is analyzed once
+            groups.setdefault(item["cache_key"], []).append(item)
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run_group(group: List[Dict]):
+        lead = group[0]
+        async with semaphore:
+            start = time.perf_counter()
+            cached = lead["cached"]
+            await process_analysis(lead["job_id"], lead["company_name"], lead["report_type"], lead["file_path"],
+                                   lead["cache_key"], cached)
+        lead_job = await asyncio.to_thread(jobs.get, lead["job_id"])
+        lines = [batch_line(lead, lead_job, "partial_cache" if cached else "analysis", time.perf_counter() - start)]
+        for dup in group[1:]:
+            os.remove(dup["file_path"])
+            job = lead_job.model_copy(update={"job_id": dup["job_id"]})
+            await asyncio.to_thread(jobs.save, job)
+            lines.append(batch_line(dup, job, "duplicate", time.perf_counter() - start))
+        return lines
+
+    # Scheduled now, not when the stream is read: the batch runs to completion either way
+    tasks = [asyncio.create_task(run_group(group)) for group in groups.values()]
+    for task in tasks:
+        _batch_tasks.add(task)
+        task.add_done_callback(_batch_tasks.discard)
+    logger.info(f"Batch: {len(items)} items, {len(tasks)} analyses scheduled, {len(immediate)} answered immediately")
+
+    async def result_stream():
+        yield json.dumps({"type": "accepted", "jobs": [
+            {"index": i["index"], "company_name": i["company_name"], "job_id": i["job_id"]} for i in items
+        ]}) + "\n"
+        counts = {"completed": 0, "failed": 0}
+
+        def tally(line: str):
+            status = json.loads(line)["status"]
+            counts["completed" if status == "completed" else "failed"] += 1
+
+        for line in immediate:
+            tally(line)
+            yield line
+        for next_done in asyncio.as_completed(tasks):
+            for line in await next_done:
+                tally(line)
+                yield line
+
+        wall = time.perf_counter() - batch_start
+        yield json.dumps({
+            "type": "summary",
+            "items": len(items),
+            "analyses_run": len(tasks),
+            "served_immediately": len(immediate),
+            "completed": counts["completed"],
+            "failed": counts["failed"],
+            "wall_seconds": round(wall, 2),
+            "items_per_minute": round(len(items) / wall * 60, 2) if wall else None,
+            "concurrency": BATCH_CONCURRENCY,
+        }) + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
 @app.get("/api/status/{job_id}")
-async def get_status(job_id: str):
-    if job_id not in jobs:
+async def get_status(job_id: str, include_result: bool = False):
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    return jobs[job_id]
+    if include_result:
+        return job
+    return status_event(job)
 
-@app.post("/api/ask/{job_id}")
-async def ask_question(job_id: str, request: QuestionRequest):
-    if job_id not in jobs:
+@app.get("/api/queue")
+async def queue_status():
+    """Worker queue depth metrics."""
+    depth = await asyncio.to_thread(task_queue.depth)
+    return {**depth, "max_depth": MAX_QUEUE_DEPTH, "mode": WORKER_MODE, "workers": WORKER_CONCURRENCY}
+
+@app.get("/api/events/{job_id}")
+async def job_event_stream(job_id: str):
+    """
+    Server-Sent Events stream of progress deltas. Events published by this process
+    arrive immediately; jobs run by another worker are picked up from the job store.
+    """
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        queue = job_events.subscribe(job_id)
+        try:
+            event = status_event(job)
+            last = None
+            while True:
+                if event != last:
+                    yield f"data: {json.dumps(event)}\n\n"
+                    last = event
+                if event["status"] in ("completed", "failed"):
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_STORE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    current = await asyncio.to_thread(jobs.get, job_id)
+                    if current is None:
+                        break
+                    event = status_event(current)
+                    if event == last:
+                        yield ": keep-alive\n\n"
+        finally:
+            job_events.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: stage, LLM, RAG and job metrics for this process."""
+    depth = await asyncio.to_thread(task_queue.depth)
+    for status in ("queued", "running"):
+        metrics.QUEUE_DEPTH.set(depth[status], status=status)
+    metrics.QUEUE_OLDEST_SECONDS.set(depth["oldest_queued_seconds"])
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/llm-cache")
+async def llm_cache_stats():
+    """Per-agent prompt/response cache hit rates and model time saved."""
+    return await asyncio.to_thread(llm_gateway.cache.stats)
+
+@app.get("/api/qa-cache")
+async def qa_cache_stats():
+    """Semantic answer cache hit rates, for tuning ANSWER_CACHE_THRESHOLD."""
+    return services['answer_cache'].stats()
+
+def build_qa_prompt(company_name: str, question: str, chunks) -> str:
+    context = ContextBuilder.render(chunks)
     
-    # In a real app, we'd use the job's context
-    # Here we instantiate a fresh RAG query or use the existing RAG instance
-    # Ideally RAG should persist or be accessible. 
-    # Our FinancialRAG uses persistent ChromaDB, so:
-    
-    rag = FinancialRAG() # Re-init connects to existing DB
-    job = jobs[job_id]
-    
-    # Simple context usage
-    context = rag.query_context(request.question, job.result.company_name) if job.result else ""
-    
-    # Simple direct generation for Q&A
-    import google.generativeai as genai
-    model = genai.GenerativeModel('models/gemma-3-27b-it')
-    
-    prompt = f"""
-    Context about {job.result.company_name}:
+    return f"""
+    Context about {company_name} (each excerpt is headed by its page and section in brackets):
     {context}
     
-    User Question: {request.question}
+    User Question: {question}
     
-    Answer the question based on the context provided.
+    Answer the question based on the context provided. Cite the page of each figure you use, e.g. [p. 12].
+    """
+
+def chunk_sources(chunks) -> List[str]:
+    """Citable sources ("p. 12, Balance sheet") for the chunks sent to the model."""
+    return list(dict.fromkeys(citation(c.get("metadata")) or c["id"] for c in chunks))
+
+async def prepare_question(job_id: str, question: str, section: Optional[str] = None):
+    """
+    Shared front half of Q&A: resolves the job, checks the semantic answer cache and,
+    on a miss, retrieves context (only from `section` of the report, if given).
+    Returns (company, cache scope, version, vector, cached, chunks).
     """
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.result is None:
+        raise HTTPException(status_code=409, detail="Analysis not completed yet")
+    if section is not None and section not in SECTION_LABELS:
+        raise HTTPException(status_code=422, detail=f"Unknown section; expected one of {sorted(SECTION_LABELS)}")
+    company_name = job.result.company_name
+    # Section-restricted answers are cached apart from whole-report ones
+    scope = f"{company_name}|{section}" if section else company_name
+
+    # Near-identical questions about unchanged documents reuse an earlier answer
+    rag = services['rag']
+    answer_cache = services['answer_cache']
+    version = await asyncio.to_thread(rag.company_version, company_name)
+    question_vector = await asyncio.to_thread(answer_cache.embed, question)
+    cached = answer_cache.lookup(scope, question_vector, version)
+    if cached:
+        return company_name, scope, version, question_vector, cached, []
+
+    # Shared, warm vector store; the query runs off the event loop
+    chunks = await asyncio.to_thread(rag.query_chunks, question, company_name, CONTEXT_CANDIDATES,
+                                     [section] if section else None)
+    # Reuse the chunks the fundamentals stage retrieved for metrics the question is about
+    evidence_ids = list(dict.fromkeys(
+        cid for name in metrics_for_question(question) for cid in job.evidence.get(name, [])
+    ))
+    if evidence_ids and not section:
+        evidence_chunks = await asyncio.to_thread(rag.get_chunks, evidence_ids)
+        chunks = interleave([chunks, evidence_chunks])
+    # Only what fits the model's context budget is sent (and cited as sources)
+    chunks = ContextBuilder(context_budget(GEMINI_MODEL)).select(chunks)
+    return company_name, scope, version, question_vector, None, chunks
+
+@app.post("/api/ask/{job_id}")
+async def ask_question(job_id: str, request: QuestionRequest):
+    company_name, scope, version, question_vector, cached, chunks = await prepare_question(
+        job_id, request.question, request.section)
+    if cached:
+        return cached
+
+    prompt = build_qa_prompt(company_name, request.question, chunks)
     
     try:
-        resp = model.generate_content(prompt)
-        return QuestionResponse(answer=resp.text)
+        # Interactive lane: served ahead of queued batch/pipeline calls
+        resp = await llm_gateway.generate(prompt, priority=PRIORITY_INTERACTIVE)
+        response = QuestionResponse(answer=resp.text, sources=chunk_sources(chunks))
+        services['answer_cache'].store(scope, request.question, question_vector, response, version)
+        return response
     except Exception as e:
         import traceback
         traceback.print_exc()
         print(f"!!! [Q&A] ERROR: {e}")
         return QuestionResponse(answer=f"I'm sorry, I encountered an error: {str(e)}")
 
+@app.post("/api/ask/{job_id}/stream")
+async def ask_question_stream(job_id: str, request: QuestionRequest, http_request: Request):
+    """
+    Streaming Q&A over Server-Sent Events: `{"token": ...}` events as the model
+    produces text, then one `{"done": true, "sources": [...]}` event. If the client
+    disconnects, the upstream generation is cancelled.
+    """
+    company_name, scope, version, question_vector, cached, chunks = await prepare_question(
+        job_id, request.question, request.section)
+
+    def sse(payload: dict) -> str:
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def token_stream():
+        if cached:
+            yield sse({"token": cached.answer})
+            yield sse({"done": True, "sources": cached.sources, "cached": True})
+            return
+
+        prompt = build_qa_prompt(company_name, request.question, chunks)
+        sources = chunk_sources(chunks)
+        parts = []
+        stream = llm_gateway.stream(prompt, priority=PRIORITY_INTERACTIVE)
+        try:
+            async for token in stream:
+                if await http_request.is_disconnected():
+                    logger.info(f"Q&A client left job {job_id}; cancelling generation")
+                    return
+                parts.append(token)
+                yield sse({"token": token})
+        except Exception as e:
+            logger.exception(f"Streaming Q&A failed for job {job_id}: {e}")
+            yield sse({"error": f"I'm sorry, I encountered an error: {str(e)}"})
+            return
+        finally:
+            # Cancels the upstream request on early exit (disconnect or error)
+            await stream.aclose()
+
+        response = QuestionResponse(answer="".join(parts), sources=sources)
+        services['answer_cache'].store(scope, request.question, question_vector, response, version)
+        yield sse({"done": True, "sources": sources})
+
+    return StreamingResponse(
+        token_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 if __name__ == "__main__":
     import uvicorn
     import os
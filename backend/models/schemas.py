@@ -10,6 +10,7 @@ class AnalysisRequest(BaseModel):
 
 class QuestionRequest(BaseModel):
     question: str
+    section: Optional[str] = None  # restrict retrieval to one report section, e.g. "balance_sheet"
 
 # --- Components ---
 class NewsSentiment(BaseModel):
@@ -20,6 +21,7 @@ class NewsSentiment(BaseModel):
     key_themes: List[str]
     headlines: List[str]
     panic_level: Literal["low", "medium", "high"]
+    degraded: bool = Field(default=False, exclude=True)  # fallback after an LLM failure; never cached
 
 class FundamentalMetrics(BaseModel):
     revenue_growth: float
@@ -29,11 +31,13 @@ class FundamentalMetrics(BaseModel):
     health_score: int = Field(..., ge=0, le=10)
     strengths: List[str]
     concerns: List[str]
+    degraded: bool = Field(default=False, exclude=True)
 
 class PeerComparison(BaseModel):
     competitive_position: Literal["leader", "average", "laggard"]
     relative_strength: int = Field(..., ge=0, le=10)
     peer_metrics: Dict[str, FundamentalMetrics]
+    summary: Optional[str] = None
     # Note: Using FundamentalMetrics as value type for simplicity, 
     # though strictly the peer dict in JSON might be simpler.
 
@@ -48,6 +52,7 @@ class ContrarianSignal(BaseModel):
     future_development: str
     timeframe: str
     entry_strategy: str
+    degraded: bool = Field(default=False, exclude=True)
 
 class AnalysisResult(BaseModel):
     company_name: str
@@ -65,6 +70,8 @@ class JobStatus(BaseModel):
     current_step: str
     error: Optional[str] = None
     result: Optional[AnalysisResult] = None
+    timings: Dict[str, float] = Field(default_factory=dict)  # seconds per stage / LLM / RAG step
+    evidence: Dict[str, List[str]] = Field(default_factory=dict)  # chunk ids retrieved per fundamentals metric
 
 class QuestionResponse(BaseModel):
     answer: str
@@ -1,33 +1,433 @@
+import re
+import json
 import time
+import heapq
+import sqlite3
+import hashlib
+import random
+import asyncio
+import threading
+import itertools
 import logging
+from concurrent.futures import Future
+from typing import Dict, Optional
 import google.generativeai as genai
 from google.api_core import exceptions
+from backend.config import (
+    GEMINI_API_KEY, GEMINI_MODEL,
+    LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX,
+    LLM_CACHE_DB_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTLS, LLM_CACHE_DEFAULT_TTL
+)
+from backend.utils import metrics
 
 logger = logging.getLogger(__name__)
 
-def generate_content_with_retry(model, prompt, max_retries=3, initial_delay=5):
+genai.configure(api_key=GEMINI_API_KEY)
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# Tokens reserved for the model's answer when charging the token bucket
+OUTPUT_TOKEN_RESERVE = 512
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for rate accounting."""
+    return max(1, len(text) // 4)
+
+def is_rate_limit_error(e: Exception) -> bool:
+    # A 429 sometimes comes as a general exception instead of ResourceExhausted
+    return isinstance(e, exceptions.ResourceExhausted) or "429" in str(e)
+
+def token_counts(prompt: str, response) -> Dict[str, int]:
+    """Prompt/response token counts from the API's usage metadata, estimated when it's absent."""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    response_tokens = getattr(usage, "candidates_token_count", None)
+    if not prompt_tokens:
+        prompt_tokens = estimate_tokens(prompt)
+    if response_tokens is None:
+        try:
+            response_tokens = estimate_tokens(response.text)
+        except Exception:
+            response_tokens = 0
+    return {"prompt": prompt_tokens, "response": response_tokens}
+
+def normalize_prompt(prompt: str) -> str:
+    # Agent prompts are indented f-strings; indentation and blank lines carry no meaning
+    return re.sub(r"\s+", " ", prompt).strip()
+
+def canonical_model_name(model_name: str) -> str:
+    """The SDK reports models as "models/<name>"; config uses the bare name. Both key the same cache entry."""
+    return model_name[len("models/"):] if model_name.startswith("models/") else model_name
+
+def cache_key(model_name: str, prompt: str, generation_config: Optional[Dict] = None) -> str:
+    raw = json.dumps([canonical_model_name(model_name), normalize_prompt(prompt), generation_config or {}],
+                     sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class CachedResponse:
+    """Stands in for a GenerateContentResponse on cache hits (agents only read `.text`)."""
+    def __init__(self, text: str):
+        self.text = text
+
+class ResponseCache:
     """
-    Generates content using the Gemini model with retry logic for rate limits.
+    Disk-backed prompt -> response cache shared by every agent (and process).
+    Entries expire per agent TTL and the table is kept under `max_entries` by
+    evicting the least recently used rows. Hit/miss counts and the model latency
+    saved by hits are tracked per agent for this process.
     """
-    retries = 0
-    while retries <= max_retries:
+
+    def __init__(self, db_path: str = LLM_CACHE_DB_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 ttls: Dict[str, int] = LLM_CACHE_TTLS, default_ttl: int = LLM_CACHE_DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                agent TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                latency REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
+        self._conn.commit()
+        self._writes = 0
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def ttl_for(self, agent: Optional[str]) -> int:
+        return self.ttls.get(agent, self.default_ttl)
+
+    def _count(self, agent: str, field: str, amount: float = 1):
+        stats = self._stats.setdefault(agent, {"hits": 0, "misses": 0, "saved_seconds": 0.0})
+        stats[field] += amount
+
+    def get(self, key: str, agent: str) -> Optional[CachedResponse]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, latency, created_at FROM llm_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl_for(agent):
+                self._count(agent, "misses")
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE cache_key = ?", (now, key))
+            self._conn.commit()
+            self._count(agent, "hits")
+            self._count(agent, "saved_seconds", row[1])
+        return CachedResponse(row[0])
+
+    def put(self, key: str, agent: str, model_name: str, text: str, latency: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO llm_cache (cache_key, agent, model, response, latency, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, agent, model_name, text, latency, now, now)
+            )
+            self._writes += 1
+            if self._writes % 50 == 0:
+                self._evict()
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+            self._conn.commit()
+
+    def _evict(self):
+        # LRU bound: keep only the `max_entries` most recently used rows
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE cache_key IN "
+            "(SELECT cache_key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            agents = {}
+            for agent, s in self._stats.items():
+                total = s["hits"] + s["misses"]
+                agents[agent] = {
+                    "hits": int(s["hits"]),
+                    "misses": int(s["misses"]),
+                    "hit_rate": round(s["hits"] / total, 3) if total else 0.0,
+                    "saved_seconds": round(s["saved_seconds"], 2),
+                    "ttl_seconds": self.ttl_for(agent),
+                }
+        return {"entries": entries, "max_entries": self.max_entries, "agents": agents}
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `per_minute / 60` units per second."""
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+class LLMGateway:
+    """
+    Process-wide entry point for every Gemini call.
+
+    - Requests-per-minute and tokens-per-minute buckets keep the process at quota.
+    - Waiters are served by priority, so interactive Q&A jumps ahead of batch jobs.
+    - 429s are retried with full-jitter backoff so retries don't synchronize.
+    - One GenerativeModel handle is reused per model name.
+    - Calls tagged with an agent name are served from the response cache when possible.
+
+    All scheduling happens on a dedicated event loop thread, which lets both
+    async handlers and synchronous agents (running in worker threads) share
+    the same limiter without blocking the web server's loop.
+    """
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int,
+                 max_retries: int, backoff_base: float, backoff_max: float,
+                 cache: Optional[ResponseCache] = None):
+        self.cache = cache
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._models = {}
+        self._models_lock = threading.Lock()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._cond: Optional[asyncio.Condition] = None
+        self._waiters = []
+        self._seq = itertools.count()
+
+    # --- Models ---
+    def get_model(self, model_name: str = GEMINI_MODEL):
+        with self._models_lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                self._models[model_name] = model
+            return model
+
+    # --- Loop plumbing ---
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro) -> Future:
+        """Schedules a coroutine on the gateway loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    # --- Rate limiting ---
+    async def _acquire(self, tokens: int, priority: int):
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        ticket = (priority, next(self._seq))
+        async with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    wait = None
+                    if self._waiters[0] == ticket:
+                        wait = self._requests.wait_time(1)
+                        if self._tokens:
+                            wait = max(wait, self._tokens.wait_time(tokens))
+                        if wait <= 0:
+                            self._requests.consume(1)
+                            if self._tokens:
+                                self._tokens.consume(tokens)
+                            return
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    async def _generate(self, prompt: str, model, priority: int, stream: bool = False,
+                        generation_config: Optional[Dict] = None, agent: Optional[str] = None):
+        cost = estimate_tokens(prompt) + OUTPUT_TOKEN_RESERVE
+        label = agent or "other"
+        for attempt in range(self.max_retries + 1):
+            with metrics.span("llm_queue", metrics.LLM_QUEUE_SECONDS, agent=label):
+                await self._acquire(cost, priority)
+            if attempt:
+                metrics.LLM_RETRIES.inc(agent=label)
+            try:
+                return await model.generate_content_async(prompt, stream=stream, generation_config=generation_config)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                wait_time = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+                print(f"!!! [AI Helper] Rate Limit hit. Retrying in {wait_time:.1f}s... (Attempt {attempt + 1}/{self.max_retries})")
+                logger.warning(f"Rate limit hit. Waiting {wait_time:.1f}s. Error: {e}")
+                await asyncio.sleep(wait_time)
+
+        raise Exception("Max retries exceeded for AI generation")
+
+    # --- Accounting ---
+    def _account(self, agent: Optional[str], outcome: str, elapsed: float,
+                 prompt: Optional[str] = None, response=None):
+        label = agent or "other"
+        metrics.LLM_REQUEST_SECONDS.observe(elapsed, agent=label, outcome=outcome)
+        metrics.record("llm", elapsed)
+        if response is not None:
+            for direction, count in token_counts(prompt, response).items():
+                metrics.LLM_TOKENS.inc(count, agent=label, direction=direction)
+
+    # --- Response cache ---
+    def _lookup(self, agent: Optional[str], model_name: str, prompt: str, generation_config: Optional[Dict]):
+        """Returns (cache_key, cached_response); the key is None when the call isn't cacheable."""
+        if self.cache is None or agent is None or self.cache.ttl_for(agent) <= 0:
+            return None, None
+        key = cache_key(model_name, prompt, generation_config)
+        return key, self.cache.get(key, agent)
+
+    def _remember(self, key: Optional[str], agent: str, model_name: str, response, latency: float):
+        if key is None:
+            return
+        try:
+            text = response.text
+        except Exception:
+            return  # blocked / empty candidates are not worth replaying
+        if text:
+            self.cache.put(key, agent, model_name, text, latency)
+
+    # --- Public API ---
+    async def generate(self, prompt: str, model_name: str = GEMINI_MODEL, priority: int = PRIORITY_BATCH,
+                       agent: Optional[str] = None, generation_config: Optional[Dict] = None):
+        """Awaitable generation for async callers (e.g. request handlers)."""
+        start = time.perf_counter()
+        key, cached = await asyncio.to_thread(self._lookup, agent, model_name, prompt, generation_config)
+        if cached is not None:
+            self._account(agent, "cached", time.perf_counter() - start)
+            return cached
+        future = self.submit(self._generate(prompt, self.get_model(model_name), priority,
+                                            generation_config=generation_config, agent=agent))
         try:
-            return model.generate_content(prompt)
-        except exceptions.ResourceExhausted as e:
-            wait_time = initial_delay * (2 ** retries)
-            print(f"!!! [AI Helper] Rate Limit hit. Retrying in {wait_time}s... (Attempt {retries + 1}/{max_retries})")
-            logger.warning(f"Rate limit hit. Waiting {wait_time}s. Error: {e}")
-            time.sleep(wait_time)
-            retries += 1
-        except Exception as e:
-            # For other errors, just re-raise or logging?
-            # If it's a 429 that comes as a general exception (sometimes happens), handle it
-            if "429" in str(e):
-                wait_time = initial_delay * (2 ** retries)
-                print(f"!!! [AI Helper] Rate Limit (Generic) hit. Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-                retries += 1
-            else:
-                raise e
-    
-    raise Exception("Max retries exceeded for AI generation")
+            response = await asyncio.wrap_future(future)
+        except Exception:
+            self._account(agent, "error", time.perf_counter() - start)
+            raise
+        self._account(agent, "ok", time.perf_counter() - start, prompt, response)
+        await asyncio.to_thread(self._remember, key, agent, model_name, response, time.perf_counter() - start)
+        return response
+
+    async def stream(self, prompt: str, model_name: str = GEMINI_MODEL, priority: int = PRIORITY_INTERACTIVE):
+        """
+        Async generator of answer text chunks as the model produces them. Closing the
+        generator (e.g. the client disconnected) cancels the upstream stream so an
+        abandoned request stops consuming quota.
+        """
+        caller_loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        model = self.get_model(model_name)
+
+        def emit(item):
+            caller_loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        async def produce():
+            try:
+                response = await self._generate(prompt, model, priority, stream=True)
+                async for chunk in response:
+                    if chunk.parts:
+                        emit(chunk.text)
+                emit(done)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                emit(e)
+
+        future = self.submit(produce())
+        start = time.perf_counter()
+        received = []
+        outcome = "cancelled"
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    outcome = "ok"
+                    return
+                if isinstance(item, Exception):
+                    outcome = "error"
+                    raise item
+                received.append(item)
+                yield item
+        finally:
+            future.cancel()
+            self._account(None, outcome, time.perf_counter() - start, prompt,
+                          CachedResponse("".join(received)))
+
+    def generate_sync(self, prompt: str, model=None, priority: int = PRIORITY_BATCH,
+                      agent: Optional[str] = None, generation_config: Optional[Dict] = None):
+        """Blocking generation for synchronous callers running off the event loop."""
+        model = model or self.get_model()
+        model_name = getattr(model, "model_name", GEMINI_MODEL)
+        start = time.perf_counter()
+        key, cached = self._lookup(agent, model_name, prompt, generation_config)
+        if cached is not None:
+            self._account(agent, "cached", time.perf_counter() - start)
+            return cached
+        future = self.submit(self._generate(prompt, model, priority, generation_config=generation_config, agent=agent))
+        try:
+            response = future.result()
+        except Exception:
+            self._account(agent, "error", time.perf_counter() - start)
+            raise
+        self._account(agent, "ok", time.perf_counter() - start, prompt, response)
+        self._remember(key, agent, model_name, response, time.perf_counter() - start)
+        return response
+
+llm_gateway = LLMGateway(
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    max_retries=LLM_MAX_RETRIES,
+    backoff_base=LLM_BACKOFF_BASE,
+    backoff_max=LLM_BACKOFF_MAX,
+    cache=ResponseCache(),
+)
+
+def get_model(model_name: str = GEMINI_MODEL):
+    """Returns the shared GenerativeModel handle for `model_name`."""
+    return llm_gateway.get_model(model_name)
+
+def generate_content_with_retry(model, prompt, priority=PRIORITY_BATCH, agent=None):
+    """
+    Generates content using the Gemini model through the shared gateway
+    (rate limiting, priority, jittered retry on 429s and, when `agent` is
+    given, the response cache).
+    """
+    return llm_gateway.generate_sync(prompt, model=model, priority=priority, agent=agent)
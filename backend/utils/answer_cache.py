@@ -0,0 +1,74 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from backend.config import ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_SIZE
+from backend.models.schemas import QuestionResponse
+
+class SemanticAnswerCache:
+    """
+    Per-company cache of Q&A answers looked up by question similarity.
+    A cached answer is reused when the cosine similarity of the question embeddings
+    exceeds the threshold and the company's documents are unchanged (same version).
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List], threshold: float = ANSWER_CACHE_THRESHOLD,
+                 max_per_company: int = ANSWER_CACHE_SIZE):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_per_company = max_per_company
+        # {company: {"version": str, "entries": OrderedDict[question -> (vector, QuestionResponse)]}}
+        self._companies: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn([question])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, company_name: str, vector: np.ndarray, version: str) -> Optional[QuestionResponse]:
+        with self._lock:
+            bucket = self._companies.get(company_name)
+            if bucket is None or bucket["version"] != version or not bucket["entries"]:
+                if bucket is not None and bucket["version"] != version:
+                    # Documents changed: every cached answer for this company is stale
+                    del self._companies[company_name]
+                self.misses += 1
+                return None
+
+            keys = list(bucket["entries"].keys())
+            matrix = np.vstack([bucket["entries"][k][0] for k in keys])
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            bucket["entries"].move_to_end(keys[best])
+            self.hits += 1
+            return bucket["entries"][keys[best]][1]
+
+    def store(self, company_name: str, question: str, vector: np.ndarray, response: QuestionResponse, version: str):
+        with self._lock:
+            bucket = self._companies.get(company_name)
+            if bucket is None or bucket["version"] != version:
+                bucket = {"version": version, "entries": OrderedDict()}
+                self._companies[company_name] = bucket
+            bucket["entries"][question.strip().lower()] = (vector, response)
+            bucket["entries"].move_to_end(question.strip().lower())
+            while len(bucket["entries"]) > self.max_per_company:
+                bucket["entries"].popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "threshold": self.threshold,
+                "companies": len(self._companies),
+                "entries": sum(len(b["entries"]) for b in self._companies.values()),
+            }
@@ -1,22 +1,36 @@
-import requests
-import logging
-from typing import List, Dict
+import re
 import time
-from backend.config import NEWS_API_KEY
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import quote_plus
+from typing import Dict, List, Optional
+import httpx
+import feedparser
+from backend.config import (
+    NEWS_API_KEY, NEWS_FETCH_TTL_SECONDS, NEWS_API_TIMEOUT, NEWS_RSS_TIMEOUT,
+    NEWS_RSS_FEEDS, NEWS_MAX_ARTICLES, NEWS_CACHE_SIZE
+)
 
 logger = logging.getLogger(__name__)
 
+USER_AGENT = "ContrarianAnalyzer/1.0 (+news aggregation)"
+
 class NewsAPIClient:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, timeout: float = NEWS_API_TIMEOUT):
         self.api_key = api_key
+        self.timeout = timeout
         self.base_url = "https://newsapi.org/v2/everything"
 
-    def fetch_news(self, company_name: str, days: int = 7) -> List[Dict]:
+    async def fetch_news(self, http: httpx.AsyncClient, company_name: str, days: int = 7) -> List[Dict]:
         """
         Fetches news for the given company from the last `days`.
         """
+        if not self.api_key:
+            return []
         try:
-            response = requests.get(
+            response = await http.get(
                 self.base_url,
                 params={
                     'q': company_name,
@@ -24,13 +38,14 @@ class NewsAPIClient:
                     'language': 'en',
                     'sortBy': 'publishedAt', # Ensure latest news comes first
                     'pageSize': 20
-                }
+                },
+                timeout=self.timeout
             )
             response.raise_for_status()
-            
+
             data = response.json()
             articles = data.get('articles', [])
-            
+
             # Normalize format
             clean_articles = []
             for art in articles:
@@ -39,7 +54,7 @@ class NewsAPIClient:
                     'description': art.get('description'),
                     'url': art.get('url'),
                     'published_at': art.get('publishedAt'),
-                    'source': art.get('source', {}).get('name')
+                    'source': (art.get('source') or {}).get('name')
                 })
             return clean_articles
 
@@ -48,10 +63,146 @@ class NewsAPIClient:
             logger.error(f"NewsAPI error: {str(e)}")
             return []
 
+class RSSFeedClient:
+    """
+    Keyword RSS search (e.g. Google News). Responses are revalidated with
+    ETag / Last-Modified, so an unchanged feed costs a 304 and no parsing.
+    """
+    def __init__(self, url_template: str, timeout: float = NEWS_RSS_TIMEOUT, max_entries: int = NEWS_CACHE_SIZE):
+        self.url_template = url_template
+        self.timeout = timeout
+        self.max_entries = max_entries
+        # {url: (etag, last_modified, articles)}, least recently used first
+        self._validators: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def fetch_news(self, http: httpx.AsyncClient, company_name: str) -> List[Dict]:
+        url = self.url_template.format(query=quote_plus(company_name))
+        headers = {}
+        etag, last_modified, previous = self._validators.get(url, (None, None, []))
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        try:
+            response = await http.get(url, headers=headers, timeout=self.timeout, follow_redirects=True)
+            if response.status_code == 304:
+                return previous
+            response.raise_for_status()
+
+            # feedparser is CPU-bound; keep it off the event loop
+            feed = await asyncio.to_thread(feedparser.parse, response.content)
+            articles = []
+            for entry in feed.entries:
+                source = entry.get('source') or {}
+                articles.append({
+                    'title': entry.get('title'),
+                    'description': self._strip_html(entry.get('summary', '')),
+                    'url': entry.get('link'),
+                    'published_at': entry.get('published'),
+                    'source': source.get('title') or feed.feed.get('title')
+                })
+            self._validators[url] = (response.headers.get('ETag'), response.headers.get('Last-Modified'), articles)
+            self._validators.move_to_end(url)
+            while len(self._validators) > self.max_entries:
+                self._validators.popitem(last=False)
+            return articles
+
+        except Exception as e:
+            print(f"!!! [RSS] ERROR ({url}): {e}")
+            logger.error(f"RSS error for {url}: {str(e)}")
+            return []
+
+    @staticmethod
+    def _strip_html(text: str) -> str:
+        return re.sub(r"<[^>]+>", " ", text or "").strip()
+
+def _title_key(title: str) -> str:
+    # Syndicated copies differ in punctuation and the trailing " - Publisher"
+    title = re.sub(r"\s+-\s+[^-]+$", "", title or "")
+    return re.sub(r"[^a-z0-9]+", " ", title.lower()).strip()
+
+def dedupe_articles(articles: List[Dict]) -> List[Dict]:
+    """Drops articles whose URL or normalized title was already seen (first one wins)."""
+    seen_urls, seen_titles = set(), set()
+    unique = []
+    for art in articles:
+        url = (art.get('url') or "").split("?")[0].rstrip("/")
+        title = _title_key(art.get('title'))
+        if not title or title == "removed" or (url and url in seen_urls) or title in seen_titles:
+            continue
+        seen_urls.add(url)
+        seen_titles.add(title)
+        unique.append(art)
+    return unique
+
 class NewsAggregator:
-    def __init__(self):
-        self.client = NewsAPIClient(api_key=NEWS_API_KEY)
+    """
+    Fans out to NewsAPI and the configured RSS feeds concurrently over one pooled
+    HTTP client, merges and dedupes the results, and caches them per company
+    query for `ttl` seconds (at most `max_entries` queries).
+    """
+    def __init__(self, ttl: int = NEWS_FETCH_TTL_SECONDS, max_articles: int = NEWS_MAX_ARTICLES,
+                 max_entries: int = NEWS_CACHE_SIZE):
+        self.clients = [NewsAPIClient(api_key=NEWS_API_KEY)]
+        self.clients += [RSSFeedClient(url) for url in NEWS_RSS_FEEDS]
+        self.ttl = ttl
+        self.max_articles = max_articles
+        self.max_entries = max_entries
+        self._http: Optional[httpx.AsyncClient] = None
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()  # {query: (fetched_at, articles)}, oldest first
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                headers={"User-Agent": USER_AGENT},
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._http
+
+    async def fetch_news(self, company_name: str) -> List[Dict]:
+        query = " ".join(company_name.lower().split())
+        with self._lock:
+            cached = self._cache.get(query)
+        if cached and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+
+        # Concurrent jobs for the same company share one fetch. It runs as its own task
+        # and every caller awaits it shielded, so a cancelled caller never cancels it.
+        task = self._inflight.get(query)
+        if task is None:
+            task = asyncio.create_task(self._fetch(query, company_name), name=f"news:{query}")
+            self._inflight[query] = task
+            task.add_done_callback(lambda t: self._fetch_done(query, t))
+        return await asyncio.shield(task)
+
+    def _fetch_done(self, query: str, task: asyncio.Task):
+        if self._inflight.get(query) is task:
+            del self._inflight[query]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller has gone
+
+    async def _fetch(self, query: str, company_name: str) -> List[Dict]:
+        http = self._client()
+        start = time.perf_counter()
+        results = await asyncio.gather(*(c.fetch_news(http, company_name) for c in self.clients))
+        merged = [art for source in results for art in source]
+        articles = dedupe_articles(merged)[:self.max_articles]
+        print(f"[News] {len(merged)} articles from {len(self.clients)} sources -> "
+              f"{len(articles)} unique in {time.perf_counter() - start:.2f}s")
+        if articles:
+            with self._lock:
+                now = time.monotonic()
+                self._cache[query] = (now, articles)
+                self._cache.move_to_end(query)
+                # Entries are in fetch order: drop expired ones, then the oldest over the cap
+                while self._cache and (len(self._cache) > self.max_entries
+                                       or now - next(iter(self._cache.values()))[0] >= self.ttl):
+                    self._cache.popitem(last=False)
+        return articles
 
-    def fetch_news(self, company_name: str) -> List[Dict]:
-        # In a full production app, this would try multiple clients
-        return self.client.fetch_news(company_name)
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import math
+import hashlib
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Keeps financial tokens like "d/e", "fy24", "12.5", "m&a" intact
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[./&-][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were what which with
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+class BM25Index:
+    """Inverted index over the chunks of a single document."""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}  # {term: {chunk_id: term_freq}}
+        self.doc_len: Dict[str, int] = {}               # {chunk_id: n_tokens}
+
+    def add(self, chunk_id: str, text: str):
+        tokens = tokenize(text)
+        self.doc_len[chunk_id] = len(tokens)
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, {})[chunk_id] = tf
+
+    def to_dict(self) -> Dict:
+        return {"postings": self.postings, "doc_len": self.doc_len}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BM25Index":
+        index = cls()
+        index.postings = data.get("postings", {})
+        index.doc_len = data.get("doc_len", {})
+        return index
+
+class BM25Store:
+    """
+    Persists one BM25Index per document under <root>/<company>/<doc_id>.json and
+    scores queries across all documents of a company. Indexes are reloaded only
+    when their file changes, so indexes written by another process are picked up.
+    """
+
+    def __init__(self, root: str, k1: float = 1.5, b: float = 0.75):
+        self.root = root
+        self.k1 = k1
+        self.b = b
+        self._cache: Dict[str, Tuple[float, BM25Index]] = {}  # {path: (mtime, index)}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _company_dir(self, company_name: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(company_name.encode("utf-8")).hexdigest()[:16])
+
+    def save(self, company_name: str, doc_id: str, index: BM25Index):
+        if not index.doc_len:
+            return
+        company_dir = self._company_dir(company_name)
+        os.makedirs(company_dir, exist_ok=True)
+        path = os.path.join(company_dir, f"{doc_id}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def delete_company(self, company_name: str):
+        company_dir = self._company_dir(company_name)
+        if os.path.isdir(company_dir):
+            for entry in os.scandir(company_dir):
+                os.remove(entry.path)
+            os.rmdir(company_dir)
+
+    def rename_company(self, old_name: str, new_name: str):
+        """Moves a company's indexes to another name, e.g. after the name was normalized."""
+        old_dir = self._company_dir(old_name)
+        if old_name == new_name or not os.path.isdir(old_dir):
+            return
+        new_dir = self._company_dir(new_name)
+        os.makedirs(new_dir, exist_ok=True)
+        for entry in os.scandir(old_dir):
+            os.replace(entry.path, os.path.join(new_dir, entry.name))
+        os.rmdir(old_dir)
+
+    def company_version(self, company_name: str) -> str:
+        """Changes whenever a document is added to or removed from the company."""
+        company_dir = self._company_dir(company_name)
+        if not os.path.isdir(company_dir):
+            return ""
+        entries = sorted(
+            (entry.name, entry.stat().st_mtime) for entry in os.scandir(company_dir) if entry.name.endswith(".json")
+        )
+        return hashlib.sha1(repr(entries).encode("utf-8")).hexdigest()
+
+    def _load_company(self, company_name: str) -> List[BM25Index]:
+        company_dir = self._company_dir(company_name)
+        if not os.path.isdir(company_dir):
+            return []
+        indexes = []
+        with self._lock:
+            for entry in os.scandir(company_dir):
+                if not entry.name.endswith(".json"):
+                    continue
+                mtime = entry.stat().st_mtime
+                cached = self._cache.get(entry.path)
+                if cached is None or cached[0] != mtime:
+                    with open(entry.path, "r", encoding="utf-8") as f:
+                        cached = (mtime, BM25Index.from_dict(json.load(f)))
+                    self._cache[entry.path] = cached
+                indexes.append(cached[1])
+        return indexes
+
+    def search(self, company_name: str, query: str, top_k: int = 20) -> List[Tuple[str, float]]:
+        """Returns [(chunk_id, score)] sorted by BM25 score over all of the company's documents."""
+        indexes = self._load_company(company_name)
+        terms = set(tokenize(query))
+        if not indexes or not terms:
+            return []
+
+        n_chunks = sum(len(ix.doc_len) for ix in indexes)
+        avg_len = sum(sum(ix.doc_len.values()) for ix in indexes) / max(1, n_chunks)
+
+        scores: Dict[str, float] = {}
+        for term in terms:
+            df = sum(len(ix.postings.get(term, {})) for ix in indexes)
+            if df == 0:
+                continue
+            idf = math.log(1 + (n_chunks - df + 0.5) / (df + 0.5))
+            for ix in indexes:
+                for chunk_id, tf in ix.postings.get(term, {}).items():
+                    norm = self.k1 * (1 - self.b + self.b * ix.doc_len[chunk_id] / avg_len)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuses several ranked id lists; robust to the different score scales of dense and BM25 retrieval."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
@@ -0,0 +1,161 @@
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Checked in order: notes headings mention the statements they annotate
+SECTION_PATTERNS = [
+    ("notes", r"notes (forming part of|to) (the )?(standalone |consolidated )?financial statements"),
+    ("mdna", r"management.?s? discussion (and|&) analysis|\bmd ?& ?a\b"),
+    ("directors_report", r"(board.?s?|directors.?) report"),
+    ("auditors_report", r"auditor.?s.? report"),
+    ("corporate_governance", r"(report on )?corporate governance"),
+    ("income_statement", r"statement of profit (and|&) loss|income statement|profit (and|&) loss (account|statement)"),
+    ("balance_sheet", r"balance sheet"),
+    ("cash_flow", r"cash flow statement|statement of cash flows?"),
+]
+SECTION_RES = [(name, re.compile(pattern, re.IGNORECASE)) for name, pattern in SECTION_PATTERNS]
+SECTION_LABELS = {
+    "general": "General",
+    "notes": "Notes to accounts",
+    "mdna": "MD&A",
+    "directors_report": "Directors' report",
+    "auditors_report": "Auditor's report",
+    "corporate_governance": "Corporate governance",
+    "income_statement": "Profit and loss statement",
+    "balance_sheet": "Balance sheet",
+    "cash_flow": "Cash flow statement",
+}
+# Headings are short and don't end a sentence
+MAX_HEADING_WORDS = 12
+# A page naming this many sections is a table of contents, not a section start
+TOC_MIN_HEADINGS = 3
+
+NUMBER_RE = re.compile(r"^\(?[-+]?(?:Rs\.?|₹|\$)?\d[\d,]*(?:\.\d+)?\)?%?$")
+
+def make_text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " "]
+    )
+
+def is_numeric_row(tokens: List[str]) -> bool:
+    """Statement-style row: at least two numbers making up about half the tokens."""
+    numeric = sum(1 for t in tokens if NUMBER_RE.match(t))
+    return numeric >= 2 and numeric * 2 >= len(tokens) - 1
+
+def detect_section(line: str) -> Optional[str]:
+    stripped = line.strip()
+    if not stripped or stripped.endswith(".") or len(stripped.split()) > MAX_HEADING_WORDS:
+        return None
+    for name, pattern in SECTION_RES:
+        if pattern.search(stripped):
+            return name
+    return None
+
+def citation(metadata: Dict[str, Any]) -> Optional[str]:
+    """Human-readable source for a chunk, e.g. "p. 42, Balance sheet (table)"."""
+    if not metadata or "page" not in metadata:
+        return None
+    parts = [f"p. {metadata['page']}"]
+    section = metadata.get("section", "general")
+    if section != "general":
+        parts.append(SECTION_LABELS.get(section, section))
+    label = ", ".join(parts)
+    return f"{label} (table)" if metadata.get("is_table") else label
+
+class ReportChunker:
+    """
+    Splits parsed report pages into chunks that never cross a page, keeping the page
+    number, the report section in force (from headings such as "Balance Sheet" or
+    "Management Discussion and Analysis") and whether the text is a table row block
+    as metadata. Prose goes through the usual recursive splitter; table rows are
+    grouped without overlap so a row is never cut or repeated.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.splitter = make_text_splitter()
+
+    @staticmethod
+    def _table_labels(tables: List[List[List[str]]]) -> set:
+        """Row labels of the tables pdfplumber found on the page."""
+        labels = set()
+        for table in tables or []:
+            for row in table:
+                first = next((cell for cell in row if cell), "")
+                if len(first) > 3:
+                    labels.add(first.lower())
+        return labels
+
+    def _is_table_line(self, line: str, labels: set) -> bool:
+        tokens = line.split()
+        if not tokens:
+            return False
+        if is_numeric_row(tokens):
+            return True
+        lowered = line.lower()
+        return any(lowered.startswith(label) for label in labels)
+
+    def _blocks(self, lines: List[str], section: str, labels: set):
+        """Yields (section, is_table, text) runs; a lone table-like line stays in its prose block."""
+        kinds = [self._is_table_line(line, labels) for line in lines]
+        for i, is_table in enumerate(kinds):
+            if is_table and not (i > 0 and kinds[i - 1]) and not (i + 1 < len(kinds) and kinds[i + 1]):
+                kinds[i] = False
+
+        block: List[str] = []
+        block_kind = False
+        for line, is_table in zip(lines, kinds):
+            heading = None if is_table else detect_section(line)
+            if heading and heading != section:
+                if block:
+                    yield section, block_kind, "\n".join(block)
+                block = []
+                section = heading
+            elif block and is_table != block_kind:
+                # A heading directly above a table stays with the table it titles
+                if not (is_table and len(block) == 1 and detect_section(block[0])):
+                    yield section, block_kind, "\n".join(block)
+                    block = []
+            block_kind = is_table
+            block.append(line)
+        if block:
+            yield section, block_kind, "\n".join(block)
+
+    def _split_table(self, text: str) -> Iterator[str]:
+        rows, size = [], 0
+        for row in text.splitlines():
+            if rows and size + len(row) + 1 > self.chunk_size:
+                yield "\n".join(rows)
+                rows, size = [], 0
+            rows.append(row)
+            size += len(row) + 1
+        if rows:
+            yield "\n".join(rows)
+
+    def iter_chunks(self, pages: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Chunks a page stream ({'page', 'text', 'tables'} as produced by PDFParser) into
+        {'text', 'page', 'section', 'is_table'} dicts, lazily and in page order.
+        """
+        section = "general"
+        for page in pages:
+            text = page.get("text") or ""
+            lines = [line for line in text.splitlines() if line.strip()]
+            if not lines:
+                continue
+            headings = {detect_section(line) for line in lines} - {None}
+            if len(headings) >= TOC_MIN_HEADINGS:
+                # Contents page: index it, but don't let it switch the current section
+                blocks = [(section, False, "\n".join(lines))]
+            else:
+                blocks = list(self._blocks(lines, section, self._table_labels(page.get("tables"))))
+                section = blocks[-1][0]
+            for block_section, is_table, block_text in blocks:
+                pieces = self._split_table(block_text) if is_table else self.splitter.split_text(block_text)
+                for piece in pieces:
+                    yield {"text": piece, "page": page["page"], "section": block_section, "is_table": is_table}
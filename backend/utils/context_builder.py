@@ -0,0 +1,118 @@
+import re
+from typing import Dict, List, Optional
+from backend.config import GEMINI_MODEL, CONTEXT_TOKEN_BUDGET, CONTEXT_TOKEN_BUDGETS
+from backend.utils.ai_helper import estimate_tokens
+from backend.utils.chunker import NUMBER_RE, citation, is_numeric_row
+
+# Splitter overlap is 200 chars; shorter head/tail matches are coincidence, not overlap
+MIN_OVERLAP = 20
+MAX_OVERLAP = 400
+# A truncated chunk shorter than this isn't worth its separator
+MIN_FRAGMENT_TOKENS = 40
+SEPARATOR = "\n\n---\n\n"
+
+DOT_LEADER_RE = re.compile(r"(?:\.\s?){3,}|_{3,}|-{4,}")
+
+def context_budget(model_name: str = GEMINI_MODEL) -> int:
+    """Token budget for retrieved context in a prompt to `model_name`."""
+    return CONTEXT_TOKEN_BUDGETS.get(model_name, CONTEXT_TOKEN_BUDGET)
+
+def overlap_length(left: str, right: str) -> int:
+    """Length of the longest tail of `left` that `right` starts with (0 below MIN_OVERLAP)."""
+    tail = left[-MAX_OVERLAP:]
+    probe = right[:MIN_OVERLAP]
+    if len(probe) < MIN_OVERLAP:
+        return 0
+    start = tail.find(probe)
+    while start != -1:
+        if right.startswith(tail[start:]):
+            return len(tail) - start
+        start = tail.find(probe, start + 1)
+    return 0
+
+def _compact_number(token: str) -> str:
+    negative = token.startswith("(") and token.endswith(")")
+    token = token.strip("()").replace(",", "")
+    if re.fullmatch(r"[-+]?\d+\.0+%?", token):
+        token = re.sub(r"\.0+", "", token)
+    return f"-{token}" if negative else token
+
+def compress_tables(text: str) -> str:
+    """
+    Shrinks statement-style rows: dot leaders and column padding go, and numbers
+    lose thousands separators and trailing zero decimals ("(1,234.00)" -> "-1234").
+    Prose lines only have their whitespace collapsed.
+    """
+    lines = []
+    for line in text.splitlines():
+        tokens = DOT_LEADER_RE.sub(" ", line).split()
+        if not tokens:
+            continue
+        if is_numeric_row(tokens):
+            tokens = [_compact_number(t) if NUMBER_RE.match(t) else t for t in tokens]
+        lines.append(" ".join(tokens))
+    return "\n".join(lines)
+
+def _truncate(text: str, max_tokens: int) -> Optional[str]:
+    """Cuts `text` to roughly `max_tokens` at a line or sentence boundary."""
+    if max_tokens < MIN_FRAGMENT_TOKENS:
+        return None
+    cut = text[:max_tokens * 4]
+    boundary = max(cut.rfind("\n"), cut.rfind(". "))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip()
+
+class ContextBuilder:
+    """
+    Packs retrieved chunks into a prompt context under a token budget: chunks go
+    in relevance order, text repeated by the splitter's overlap with an already
+    packed chunk is dropped, tables are compacted, and the last chunk that only
+    partly fits is truncated at a line boundary.
+    """
+
+    def __init__(self, budget_tokens: Optional[int] = None):
+        self.budget_tokens = budget_tokens if budget_tokens is not None else context_budget()
+
+    def select(self, chunks: List[Dict]) -> List[Dict]:
+        """Chunks (best first) that fit the budget, each with its packed `text`."""
+        packed: List[Dict] = []
+        remaining = self.budget_tokens
+        for chunk in chunks:
+            text = compress_tables(chunk["text"])
+            for other in packed:
+                if text in other["text"]:
+                    text = ""
+                    break
+                text = text[overlap_length(other["text"], text):]
+                cut = overlap_length(text, other["text"])
+                if cut:
+                    text = text[:-cut]
+            text = text.strip()
+            if not text:
+                continue
+            # Separator and citation header are part of the price
+            overhead = estimate_tokens(SEPARATOR + (citation(chunk.get("metadata")) or ""))
+            cost = estimate_tokens(text) + overhead
+            if cost > remaining:
+                text = _truncate(text, remaining - overhead)
+                if not text:
+                    continue
+                cost = estimate_tokens(text) + overhead
+            packed.append(dict(chunk, text=text))
+            remaining -= cost
+            if remaining < MIN_FRAGMENT_TOKENS:
+                break
+        return packed
+
+    @staticmethod
+    def render(chunks: List[Dict]) -> str:
+        """Joins packed chunks, each headed by its page/section citation when known."""
+        parts = []
+        for chunk in chunks:
+            source = citation(chunk.get("metadata"))
+            parts.append(f"[{source}]\n{chunk['text']}" if source else chunk["text"])
+        return SEPARATOR.join(parts)
+
+    def build(self, chunks: List[Dict]) -> str:
+        return self.render(self.select(chunks))
@@ -0,0 +1,46 @@
+import asyncio
+import logging
+from typing import Dict, Set
+from backend.models.schemas import JobStatus
+
+logger = logging.getLogger(__name__)
+
+def status_event(job: JobStatus) -> Dict:
+    """Small progress delta pushed to clients; the full result is fetched once at completion."""
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "progress": job.progress,
+        "current_step": job.current_step,
+        "error": job.error,
+    }
+
+class JobEventBus:
+    """
+    In-process pub/sub of job progress events. Must be used from the event loop thread.
+    Subscribers on other worker processes don't see these events; the SSE endpoint
+    falls back to reading the job store for them.
+    """
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(job_id)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[job_id]
+
+    def publish(self, job_id: str, event: Dict):
+        for queue in list(self._subscribers.get(job_id, ())):
+            if queue.full():
+                # Slow consumer: only the latest state matters
+                queue.get_nowait()
+            queue.put_nowait(event)
@@ -0,0 +1,160 @@
+import time
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+from backend.config import JOB_STORE, JOB_DB_PATH, JOB_CACHE_SIZE, JOB_TTL_SECONDS
+from backend.models.schemas import JobStatus
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = ("completed", "failed")
+
+class JobStore(ABC):
+    """Interface for job persistence. Implementations must be thread-safe."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        ...
+
+    @abstractmethod
+    def save(self, job: JobStatus):
+        ...
+
+    @abstractmethod
+    def delete(self, job_id: str):
+        ...
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        """Drops finished jobs older than the TTL. Returns the number removed."""
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+class InMemoryJobStore(JobStore):
+    """Single-process store with TTL eviction. Useful for local development."""
+
+    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._jobs = {}  # {job_id: (JobStatus, updated_at)}
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            return entry[0] if entry else None
+
+    def save(self, job: JobStatus):
+        with self._lock:
+            self._jobs[job.job_id] = (job, time.time())
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def evict_expired(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [jid for jid, (job, ts) in self._jobs.items()
+                       if job.status in TERMINAL_STATES and ts < cutoff]
+            for jid in expired:
+                del self._jobs[jid]
+        return len(expired)
+
+class SQLiteJobStore(JobStore):
+    """
+    SQLite-backed store shared by every worker process on the box, with an
+    in-memory LRU front cache. Only finished jobs are cached: they never change
+    again, while running jobs may be updated by another process.
+    """
+
+    EVICT_EVERY = 50  # saves between opportunistic eviction passes
+
+    def __init__(self, db_path: str = JOB_DB_PATH, cache_size: int = JOB_CACHE_SIZE,
+                 ttl_seconds: int = JOB_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._saves = 0
+
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs(status, updated_at)")
+        self._conn.commit()
+
+    def _cache_put(self, job: JobStatus):
+        self._cache[job.job_id] = job
+        self._cache.move_to_end(job.job_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        with self._lock:
+            job = self._cache.get(job_id)
+            if job is not None:
+                self._cache.move_to_end(job_id)
+                return job
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = JobStatus.model_validate_json(row[0])
+            if job.status in TERMINAL_STATES:
+                self._cache_put(job)
+            return job
+
+    def save(self, job: JobStatus):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+                (job.job_id, job.status, job.model_dump_json(), time.time())
+            )
+            self._conn.commit()
+            if job.status in TERMINAL_STATES:
+                self._cache_put(job)
+            else:
+                self._cache.pop(job.job_id, None)
+            self._saves += 1
+            should_evict = self._saves % self.EVICT_EVERY == 0
+        if should_evict:
+            self.evict_expired()
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+            self._cache.pop(job_id, None)
+
+    def evict_expired(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (*TERMINAL_STATES, cutoff)
+            ).fetchall()
+            for (job_id,) in rows:
+                self._cache.pop(job_id, None)
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (*TERMINAL_STATES, cutoff)
+            )
+            self._conn.commit()
+        if rows:
+            logger.info(f"Evicted {len(rows)} expired jobs")
+        return len(rows)
+
+def create_job_store() -> JobStore:
+    if JOB_STORE == "memory":
+        return InMemoryJobStore()
+    return SQLiteJobStore()
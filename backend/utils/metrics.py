@@ -0,0 +1,193 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+# Seconds; covers sub-10ms queries up to multi-minute ingests
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield from super().render()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def render(self) -> Iterator[str]:
+        yield from super().render()
+        with self._lock:
+            items = [(k, {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]})
+                     for k, v in self._values.items()]
+        for key, state in items:
+            for bound, count in zip(self.buckets, state["buckets"]):
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                yield f"{self.name}_bucket{labels} {count}"
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {state['count']}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {round(state['sum'], 6)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}"
+
+class MetricsRegistry:
+    """Minimal in-process Prometheus registry rendered in the text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+JOBS_TOTAL = registry.counter("contrasignal_jobs_total", "Analysis jobs finished, by final status", ["status"])
+JOBS_IN_PROGRESS = registry.gauge("contrasignal_jobs_in_progress", "Analysis jobs currently running")
+STAGE_SECONDS = registry.histogram("contrasignal_stage_seconds", "Pipeline stage duration", ["stage"])
+LLM_REQUEST_SECONDS = registry.histogram("contrasignal_llm_request_seconds",
+                                         "LLM call latency including rate-limit wait and retries",
+                                         ["agent", "outcome"])
+LLM_QUEUE_SECONDS = registry.histogram("contrasignal_llm_queue_seconds",
+                                       "Time an LLM call waited on the rate limiter", ["agent"])
+LLM_TOKENS = registry.counter("contrasignal_llm_tokens_total", "LLM tokens by direction", ["agent", "direction"])
+LLM_RETRIES = registry.counter("contrasignal_llm_retries_total", "LLM calls retried after a rate limit", ["agent"])
+PDF_PARSE_SECONDS = registry.histogram("contrasignal_pdf_parse_seconds", "PDF text/table extraction per report")
+EMBED_SECONDS = registry.histogram("contrasignal_embed_seconds", "Embedding latency per batch")
+RAG_INGEST_SECONDS = registry.histogram("contrasignal_rag_ingest_seconds", "Vector store ingestion per report")
+RAG_CHUNKS = registry.counter("contrasignal_rag_chunks_total", "Chunks seen at ingestion", ["result"])
+RAG_QUERY_SECONDS = registry.histogram("contrasignal_rag_query_seconds", "Hybrid retrieval latency")
+RAG_QUERY_RESULTS = registry.counter("contrasignal_rag_query_results_total", "Chunks returned by retrieval")
+QUEUE_DEPTH = registry.gauge("contrasignal_task_queue_depth", "Worker queue tasks by status", ["status"])
+QUEUE_OLDEST_SECONDS = registry.gauge("contrasignal_task_queue_oldest_seconds", "Age of the oldest queued task")
+
+# --- Per-job timing breakdown ---
+# Set for the duration of a job; asyncio tasks and to_thread calls inherit it,
+# so any span inside the job adds to that job's breakdown.
+_job_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("job_timings", default=None)
+_job_lock = threading.Lock()
+
+@contextmanager
+def track_job():
+    """Collects the timing breakdown of everything run inside the block."""
+    timings: Dict[str, float] = {}
+    token = _job_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _job_timings.reset(token)
+
+def record(name: str, amount: float):
+    """Adds to the current job's breakdown (no-op outside a job)."""
+    timings = _job_timings.get()
+    if timings is not None:
+        with _job_lock:
+            timings[name] = round(timings.get(name, 0) + amount, 4)
+
+@contextmanager
+def span(name: str, histogram: Optional[Histogram] = None, **labels):
+    """Times the block into `histogram` and the current job's breakdown under `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if histogram is not None:
+            histogram.observe(elapsed, **labels)
+        record(name, elapsed)
+
+def timed_iter(iterable: Iterable, name: str, histogram: Optional[Histogram] = None) -> Iterator:
+    """Yields from `iterable`, timing only the time spent producing items."""
+    iterator = iter(iterable)
+    spent = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                spent += time.perf_counter() - start
+            yield item
+    finally:
+        if histogram is not None:
+            histogram.observe(spent)
+        record(name, spent)
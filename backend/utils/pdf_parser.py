@@ -1,54 +1,112 @@
 import pdfplumber
 import os
 import logging
-from typing import List, Dict, Any
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator
+from backend.config import PDF_WORKERS, PDF_PAGES_PER_TASK, PDF_PARALLEL_MIN_PAGES
 
 logger = logging.getLogger(__name__)
 
+def _clean_tables(page_tables: List[List[List[str]]]) -> List[List[List[str]]]:
+    cleaned = []
+    for table_data in page_tables:
+        # Filter out empty or tiny tables (likely noise)
+        if not table_data or len(table_data) < 2:
+            continue
+
+        # basic cleanup
+        cleaned_table = []
+        for row in table_data:
+            cleaned_row = [cell.strip().replace('\n', ' ') if cell else '' for cell in row]
+            cleaned_table.append(cleaned_row)
+        cleaned.append(cleaned_table)
+    return cleaned
+
+def _extract_page_range(pdf_path: str, start: int, end: int, include_tables: bool) -> List[Dict[str, Any]]:
+    """Extracts pages [start, end). Module-level so it can run in a worker process."""
+    pages = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for i in range(start, end):
+            page = pdf.pages[i]
+            pages.append({
+                'page': i + 1,
+                'text': page.extract_text() or "",
+                'tables': _clean_tables(page.extract_tables()) if include_tables else []
+            })
+            # Release pdfminer layout objects; large reports otherwise hold every page in memory
+            page.flush_cache()
+    return pages
+
 class PDFParser:
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, workers: int = PDF_WORKERS, pages_per_task: int = PDF_PAGES_PER_TASK):
         self.pdf_path = pdf_path
+        self.workers = workers
+        self.pages_per_task = pages_per_task
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"PDF not found: {pdf_path}")
 
+    def page_count(self) -> int:
+        with pdfplumber.open(self.pdf_path) as pdf:
+            return len(pdf.pages)
+
+    def iter_pages(self, include_tables: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Single pass over the document yielding {'page', 'text', 'tables'} in page order.
+        Large documents are split into page ranges parsed by a process pool; pages are
+        yielded as soon as their range is done, so consumers can start on early pages
+        while later ones are still being parsed.
+        """
+        try:
+            n_pages = self.page_count()
+        except Exception as e:
+            logger.error(f"Error opening {self.pdf_path}: {e}")
+            return
+
+        ranges = [(s, min(s + self.pages_per_task, n_pages)) for s in range(0, n_pages, self.pages_per_task)]
+
+        if self.workers <= 1 or n_pages < PDF_PARALLEL_MIN_PAGES or len(ranges) <= 1:
+            for start, end in ranges:
+                try:
+                    yield from _extract_page_range(self.pdf_path, start, end, include_tables)
+                except Exception as e:
+                    logger.error(f"Error extracting pages {start + 1}-{end} from {self.pdf_path}: {e}")
+            return
+
+        # spawn: the web process is multi-threaded, forking it is unsafe
+        pool = ProcessPoolExecutor(
+            max_workers=min(self.workers, len(ranges)),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        try:
+            futures = [
+                pool.submit(_extract_page_range, self.pdf_path, start, end, include_tables)
+                for start, end in ranges
+            ]
+            for (start, end), future in zip(ranges, futures):
+                try:
+                    yield from future.result()
+                except Exception as e:
+                    logger.error(f"Error extracting pages {start + 1}-{end} from {self.pdf_path}: {e}")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
     def extract_text(self) -> str:
         """Extracts full text from PDF."""
         full_text = []
-        try:
-            with pdfplumber.open(self.pdf_path) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        full_text.append(f"--- Page {i+1} ---\n{text}")
-            return "\n\n".join(full_text)
-        except Exception as e:
-            logger.error(f"Error extracting text from {self.pdf_path}: {e}")
-            return ""
+        for page in self.iter_pages(include_tables=False):
+            if page['text']:
+                full_text.append(f"--- Page {page['page']} ---\n{page['text']}")
+        return "\n\n".join(full_text)
 
     def extract_tables(self) -> List[Dict[str, Any]]:
         """Extracts all tables with metadata."""
         tables = []
-        try:
-            with pdfplumber.open(self.pdf_path) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    page_tables = page.extract_tables()
-                    for t_idx, table_data in enumerate(page_tables):
-                        # Filter out empty or tiny tables (likely noise)
-                        if not table_data or len(table_data) < 2:
-                            continue
-                        
-                        # basic cleanup
-                        cleaned_table = []
-                        for row in table_data:
-                            cleaned_row = [cell.strip().replace('\n', ' ') if cell else '' for cell in row]
-                            cleaned_table.append(cleaned_row)
-
-                        tables.append({
-                            'page': i + 1,
-                            'table_index': t_idx,
-                            'data': cleaned_table
-                        })
-            return tables
-        except Exception as e:
-            logger.error(f"Error extracting tables: {e}")
-            return []
+        for page in self.iter_pages(include_tables=True):
+            for t_idx, table_data in enumerate(page['tables']):
+                tables.append({
+                    'page': page['page'],
+                    'table_index': t_idx,
+                    'data': table_data
+                })
+        return tables
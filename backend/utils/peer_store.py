@@ -0,0 +1,108 @@
+import re
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+from backend.config import PEER_DB_PATH
+from backend.models.schemas import FundamentalMetrics
+
+logger = logging.getLogger(__name__)
+
+# Legal-form suffixes that don't distinguish companies ("Infosys Ltd" == "Infosys")
+CORPORATE_SUFFIXES = {
+    "ltd", "limited", "inc", "incorporated", "corp", "corporation", "co", "company",
+    "plc", "llc", "pvt", "private", "group", "holdings", "the",
+}
+
+def canonical_name(company_name: str) -> str:
+    """Lower-cased, punctuation-free company name without legal-form suffixes."""
+    words = re.sub(r"[^a-z0-9&]+", " ", company_name.lower()).split()
+    kept = [w for w in words if w not in CORPORATE_SUFFIXES]
+    return " ".join(kept or words)
+
+class PeerIndex:
+    """
+    Alias index over peer_groups.json. Group keys and every listed peer are
+    indexed by canonical name, so a lookup is a handful of dict probes (the full
+    name, then shorter word prefixes) instead of a scan over all groups. A listed
+    peer maps to the other members of every group it appears in, unless it
+    already resolves to a group key ("Reliance Industries" -> "Reliance").
+    """
+
+    def __init__(self, peer_groups: Dict[str, List[str]]):
+        self._groups: Dict[str, List[str]] = {}
+        for key, peers in peer_groups.items():
+            self._groups[canonical_name(key)] = list(peers)
+        reverse: Dict[str, List[str]] = {}
+        for key, peers in peer_groups.items():
+            for peer in peers:
+                name = canonical_name(peer)
+                others = reverse.setdefault(name, [])
+                for member in [key, *peers]:
+                    if canonical_name(member) != name and member not in others:
+                        others.append(member)
+        for name, others in reverse.items():
+            if self._lookup(name) is None:
+                self._groups[name] = others
+
+    def _lookup(self, name: str) -> Optional[List[str]]:
+        words = name.split()
+        for n in range(len(words), 0, -1):
+            peers = self._groups.get(" ".join(words[:n]))
+            if peers is not None:
+                return peers
+        return None
+
+    def peers_for(self, company_name: str) -> List[str]:
+        return self._lookup(canonical_name(company_name)) or []
+
+class PeerStore:
+    """
+    Persisted FundamentalMetrics of every company analyzed so far, keyed by
+    canonical name. Feeds the peer comparison with real numbers from earlier reports.
+    """
+
+    def __init__(self, db_path: str = PEER_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS peer_metrics (
+                company TEXT PRIMARY KEY,
+                display_name TEXT NOT NULL,
+                report_type TEXT NOT NULL,
+                metrics TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def upsert(self, company_name: str, metrics: FundamentalMetrics, report_type: str):
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO peer_metrics (company, display_name, report_type, metrics, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(company) DO UPDATE SET
+                    display_name = excluded.display_name, report_type = excluded.report_type,
+                    metrics = excluded.metrics, updated_at = excluded.updated_at
+                """,
+                (canonical_name(company_name), company_name, report_type, metrics.model_dump_json(), time.time())
+            )
+            self._conn.commit()
+
+    def get_many(self, company_names: Iterable[str]) -> Dict[str, FundamentalMetrics]:
+        """Metrics for the given companies that have been analyzed, keyed by the names asked for."""
+        wanted = {canonical_name(name): name for name in company_names}
+        if not wanted:
+            return {}
+        placeholders = ",".join("?" * len(wanted))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT company, metrics FROM peer_metrics WHERE company IN ({placeholders})", list(wanted)
+            ).fetchall()
+        return {wanted[company]: FundamentalMetrics.model_validate_json(metrics) for company, metrics in rows}
+
+    def get(self, company_name: str) -> Optional[FundamentalMetrics]:
+        return self.get_many([company_name]).get(company_name)
@@ -0,0 +1,129 @@
+import asyncio
+import inspect
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """A single node in the analysis DAG."""
+
+    def __init__(self, name: str, func: Callable[..., Any], depends_on: Sequence[str] = (),
+                 weight: int = 1, step: Optional[str] = None):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.weight = weight
+        # UI step this stage belongs to (several stages may map to one step)
+        self.step = step or name
+
+
+class AnalysisPipeline:
+    """
+    Runs stages as soon as their dependencies are satisfied.
+    Synchronous stage functions are executed in worker threads so the
+    event loop stays free to serve other requests.
+    Each stage function receives the results of its dependencies as keyword arguments.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {s.name: s for s in stages}
+        self.order = [s.name for s in stages]
+        self._validate()
+
+    def _validate(self):
+        seen = set()
+        for name in self.order:
+            for dep in self.stages[name].depends_on:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+                if dep not in seen:
+                    raise ValueError(f"Stage '{name}' must be declared after its dependency '{dep}'")
+            seen.add(name)
+
+    @property
+    def total_weight(self) -> int:
+        return sum(s.weight for s in self.stages.values())
+
+    async def run(self, on_update: Optional[Callable[[str, str], Any]] = None,
+                  seed: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Executes the DAG and returns {stage_name: result}.
+        `on_update(stage_name, event)` is called with event "started", "finished" or "cached";
+        it may be a coroutine function, in which case it is awaited.
+        Stages present in `seed` are not executed; the seeded value is used as their result.
+        """
+        seed = seed or {}
+        results: Dict[str, Any] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def notify(name: str, event: str):
+            if on_update:
+                try:
+                    update = on_update(name, event)
+                    if inspect.isawaitable(update):
+                        await update
+                except Exception as e:
+                    logger.warning(f"Pipeline progress callback failed: {e}")
+
+        async def run_stage(stage: Stage):
+            if stage.name in seed:
+                results[stage.name] = seed[stage.name]
+                await notify(stage.name, "cached")
+                return seed[stage.name]
+            if stage.depends_on:
+                await asyncio.gather(*(tasks[d] for d in stage.depends_on))
+            kwargs = {d: results[d] for d in stage.depends_on}
+            await notify(stage.name, "started")
+            if asyncio.iscoroutinefunction(stage.func):
+                result = await stage.func(**kwargs)
+            else:
+                result = await asyncio.to_thread(stage.func, **kwargs)
+            results[stage.name] = result
+            await notify(stage.name, "finished")
+            return result
+
+        for name in self.order:
+            tasks[name] = asyncio.create_task(run_stage(self.stages[name]), name=f"stage:{name}")
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for t in tasks.values():
+                t.cancel()
+            raise
+        return results
+
+
+class PipelineProgress:
+    """Translates stage events into JobStatus progress / current_step updates."""
+
+    def __init__(self, pipeline: AnalysisPipeline, step_order: List[str], start: int = 10, end: int = 95):
+        self.pipeline = pipeline
+        self.step_order = step_order
+        self.start = start
+        self.end = end
+        self.finished: set = set()
+        self.running: set = set()
+
+    def record(self, stage_name: str, event: str):
+        if event == "started":
+            self.running.add(stage_name)
+        else:
+            self.running.discard(stage_name)
+            self.finished.add(stage_name)
+
+    @property
+    def progress(self) -> int:
+        done = sum(self.pipeline.stages[n].weight for n in self.finished)
+        return self.start + int((self.end - self.start) * done / max(1, self.pipeline.total_weight))
+
+    @property
+    def current_step(self) -> str:
+        # Earliest UI step that still has unfinished stages; keeps the step list monotonic
+        for step in self.step_order:
+            pending = [n for n, s in self.pipeline.stages.items() if s.step == step and n not in self.finished]
+            if pending:
+                return step
+        return self.step_order[-1]
@@ -1,57 +1,344 @@
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
 import os
-from typing import List, Dict
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import time
+import hashlib
+import logging
+import functools
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterable, Iterator, Optional, Sequence
+from backend.config import EMBED_BATCH_SIZE, EMBED_WORKERS, EMBEDDING_MODEL, RETRIEVAL_CANDIDATES, RERANK_MODEL
+from backend.utils.bm25 import BM25Index, BM25Store, reciprocal_rank_fusion
+from backend.utils.chunker import ReportChunker, make_text_splitter
+from backend.utils.result_cache import normalize_company
+from backend.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=None)
+def make_embedding_function():
+    """One embedding model per process."""
+    if EMBEDDING_MODEL:
+        return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=EMBEDDING_MODEL)
+    return embedding_functions.DefaultEmbeddingFunction()
+
+def interleave(ranked_lists: Iterable[List[Dict]]) -> List[Dict]:
+    """Round-robin merge of best-first chunk lists, keeping the first copy of each chunk."""
+    merged, seen = [], set()
+    lists = [list(r) for r in ranked_lists]
+    for rank in range(max((len(r) for r in lists), default=0)):
+        for ranked in lists:
+            if rank < len(ranked) and ranked[rank]["id"] not in seen:
+                seen.add(ranked[rank]["id"])
+                merged.append(ranked[rank])
+    return merged
 
 class FinancialRAG:
-    def __init__(self, persist_dir: str = "chroma_db"):
+    """
+    Vector store access for financial reports. One instance is meant to be shared
+    per process (see `lifespan` in main.py): the client, splitter and embedding
+    model are loaded once, queries may run concurrently from any thread, and
+    writes are serialized. Chunks are stored, filtered and keyword-indexed under
+    the normalized company name, like the doc_id (see result_cache.report_key).
+    """
+    def __init__(self, persist_dir: str = "chroma_db", batch_size: int = EMBED_BATCH_SIZE,
+                 embed_workers: int = EMBED_WORKERS):
         self.persist_dir = persist_dir
+        self.batch_size = batch_size
+        self.embed_workers = embed_workers
         # Initialize Client
         # Note: Chroma new version uses PersistentClient
         self.client = chromadb.PersistentClient(path=persist_dir)
-        
-        self.collection = self.client.get_or_create_collection(name="financial_reports")
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ". ", " "]
-        )
 
-    def add_document(self, text: str, company_name: str, report_type: str, doc_id: str):
-        chunks = self.text_splitter.split_text(text)
-        
-        ids = [f"{doc_id}_chunk_{i}" for i in range(len(chunks))]
-        metadatas = [{
-            "company": company_name,
-            "report_type": report_type,
-            "doc_id": doc_id,
-            "chunk_index": i
-        } for i in range(len(chunks))]
-        
-        self.collection.add(
-            documents=chunks,
-            metadatas=metadatas,
-            ids=ids
+        # Embeddings are computed explicitly in batches at ingestion; queries use the same function
+        self.embedding_function = make_embedding_function()
+        self.collection = self.client.get_or_create_collection(
+            name="financial_reports",
+            embedding_function=self.embedding_function
         )
+        self.text_splitter = make_text_splitter()
+        self.chunker = ReportChunker()
+        self._write_lock = threading.Lock()
+        self.bm25 = BM25Store(os.path.join(persist_dir, "bm25"))
+        self._reranker = None
+
+    def warm_up(self):
+        """Loads the embedding model now so the first user query doesn't pay for it."""
+        start = time.perf_counter()
+        self.embedding_function(["warm up"])
+        logger.info(f"RAG embedding model warmed up in {time.perf_counter() - start:.2f}s")
+
+    def embed(self, docs: List[str]):
+        with metrics.span("embed", metrics.EMBED_SECONDS):
+            return self.embedding_function(docs)
+
+    @staticmethod
+    def chunk_id(company_name: str, text: str) -> str:
+        """Content-addressed chunk id: identical text for the same company is stored once."""
+        digest = hashlib.sha1(f"{normalize_company(company_name)}|{text}".encode("utf-8")).hexdigest()
+        return f"chunk_{digest}"
+
+    def iter_chunks(self, texts: Iterable[str]) -> Iterator[str]:
+        """Splits a stream of text segments (e.g. pages) lazily."""
+        for text in texts:
+            if text:
+                yield from self.text_splitter.split_text(text)
+
+    def add_document(self, text: str, company_name: str, report_type: str, doc_id: str) -> Dict[str, float]:
+        return self.add_chunks(self.iter_chunks([text]), company_name, report_type, doc_id)
+
+    def add_pages(self, pages: Iterable[Dict], company_name: str, report_type: str, doc_id: str) -> Dict[str, float]:
+        """
+        Ingests a PDFParser page stream; pages are chunked with page/section/table metadata
+        (see ReportChunker) and embedded while the stream is still being produced.
+        """
+        return self.add_chunks(self.chunker.iter_chunks(pages), company_name, report_type, doc_id)
+
+    def add_chunks(self, chunks: Iterable, company_name: str, report_type: str, doc_id: str,
+                   embeddings: Optional[Sequence] = None) -> Dict[str, float]:
+        """
+        Embeds a chunk stream in fixed-size batches and stores it. Chunks are strings or
+        ReportChunker dicts, whose fields other than 'text' are stored as metadata.
+        Chunks already stored for this company (from any document) are skipped before embedding.
+        `embeddings`, if given, are precomputed vectors aligned with `chunks` (e.g. from a worker process).
+        Returns ingestion stats: chunks added, duplicates skipped, seconds, chunks/sec.
+        """
+        start = time.perf_counter()
+        company = normalize_company(company_name)
+        stats = {"chunks": 0, "duplicates": 0}
+        seen = set()
+        chunk_index = 0
+        keyword_index = BM25Index()
+        pool = ThreadPoolExecutor(max_workers=self.embed_workers) if self.embed_workers > 0 else None
+        in_flight = deque()
+
+        def flush_one():
+            ids, docs, metas, embeddings = in_flight.popleft()
+            if hasattr(embeddings, "result"):
+                embeddings = embeddings.result()
+            with self._write_lock:
+                self.collection.add(ids=ids, documents=docs, metadatas=metas, embeddings=embeddings)
+            stats["chunks"] += len(ids)
+
+        def submit(batch):
+            nonlocal chunk_index
+            items = [(chunk, {}) if isinstance(chunk, str) else (chunk["text"], chunk) for chunk, _ in batch]
+            ids = [self.chunk_id(company, text) for text, _ in items]
+            existing = set(self.collection.get(ids=list(dict.fromkeys(ids)), include=[])['ids'])
+            ids_new, docs, metas, vectors = [], [], [], []
+            for cid, (text, extra), (_, vector) in zip(ids, items, batch):
+                if cid in existing or cid in seen:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(cid)
+                keyword_index.add(cid, text)
+                ids_new.append(cid)
+                docs.append(text)
+                vectors.append(vector)
+                metas.append({
+                    **{k: v for k, v in extra.items() if k != "text"},
+                    "company": company,
+                    "report_type": report_type,
+                    "doc_id": doc_id,
+                    "chunk_index": chunk_index
+                })
+                chunk_index += 1
+            if not ids_new:
+                return
+            if embeddings is not None:
+                batch_embeddings = vectors
+            elif pool:
+                # Run in the caller's context so embedding time lands in the job's breakdown
+                batch_embeddings = pool.submit(contextvars.copy_context().run, self.embed, docs)
+            else:
+                batch_embeddings = self.embed(docs)
+            in_flight.append((ids_new, docs, metas, batch_embeddings))
+            # Bound memory: only keep a couple of batches waiting on the embedder
+            while len(in_flight) > max(1, self.embed_workers):
+                flush_one()
+
+        try:
+            batch = []
+            pairs = zip(chunks, embeddings) if embeddings is not None else ((c, None) for c in chunks)
+            for pair in pairs:
+                batch.append(pair)
+                if len(batch) >= self.batch_size:
+                    submit(batch)
+                    batch = []
+            if batch:
+                submit(batch)
+            while in_flight:
+                flush_one()
+            self.bm25.save(company, doc_id, keyword_index)
+        finally:
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        stats["chunks_per_sec"] = round(stats["chunks"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+        metrics.RAG_INGEST_SECONDS.observe(stats["seconds"])
+        metrics.RAG_CHUNKS.inc(stats["chunks"], result="added")
+        metrics.RAG_CHUNKS.inc(stats["duplicates"], result="duplicate")
+        metrics.record("rag_ingest", stats["seconds"])
+        print(f"[RAG] Ingested {stats['chunks']} chunks for '{company_name}' "
+              f"({stats['duplicates']} duplicates skipped) in {stats['seconds']}s ({stats['chunks_per_sec']} chunks/s).")
+        return stats
+
+    def migrate_company_keys(self, page_size: int = 1000) -> int:
+        """
+        One-off: re-keys chunks (and keyword indexes) stored under a raw company name
+        before names were normalized. Returns the number of chunks updated.
+        """
+        marker = os.path.join(self.persist_dir, ".company_keys_normalized")
+        if os.path.exists(marker):
+            return 0
+        updated = 0
+        renamed = set()
+        with self._write_lock:
+            offset = 0
+            while True:
+                page = self.collection.get(include=["metadatas"], limit=page_size, offset=offset)
+                if not page['ids']:
+                    break
+                ids, metas = [], []
+                for cid, meta in zip(page['ids'], page['metadatas']):
+                    raw = (meta or {}).get("company")
+                    if raw and raw != normalize_company(raw):
+                        ids.append(cid)
+                        metas.append(dict(meta, company=normalize_company(raw)))
+                        renamed.add(raw)
+                if ids:
+                    self.collection.update(ids=ids, metadatas=metas)
+                    updated += len(ids)
+                offset += len(page['ids'])
+            for raw in renamed:
+                self.bm25.rename_company(raw, normalize_company(raw))
+        open(marker, "w").close()
+        if updated:
+            logger.info(f"RAG: re-keyed {updated} chunks of {len(renamed)} companies to normalized names")
+        return updated
+
+    def has_document(self, doc_id: str) -> bool:
+        """True if chunks for this doc_id are already embedded."""
+        existing = self.collection.get(where={"doc_id": doc_id}, limit=1)
+        return len(existing['ids']) > 0
+
+    def company_chunk_ids(self, company_name: str) -> List[str]:
+        """Ids of every chunk stored for the company (lets a worker skip re-embedding them)."""
+        return self.collection.get(where={"company": normalize_company(company_name)}, include=[])['ids']
+
+    def company_version(self, company_name: str) -> str:
+        """Fingerprint of the company's indexed documents (see BM25Store.company_version)."""
+        return self.bm25.company_version(normalize_company(company_name))
+
+    def _get_reranker(self):
+        if self._reranker is None and RERANK_MODEL:
+            try:
+                from sentence_transformers import CrossEncoder
+                self._reranker = CrossEncoder(RERANK_MODEL)
+            except Exception as e:
+                logger.warning(f"Reranker unavailable ({RERANK_MODEL}): {e}")
+                self._reranker = False
+        return self._reranker or None
+
+    def query_chunks(self, question: str, company_name: str, n_results: int = 5,
+                     sections: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Hybrid retrieval: dense vector search and BM25 keyword search over the company's
+        chunks, fused with reciprocal rank fusion and optionally reranked by a cross-encoder.
+        `sections` restricts the search to chunks from those report sections (see ReportChunker).
+        Returns [{'id', 'text', 'metadata', 'score'}] best first.
+        """
+        return self.query_many({"question": question}, company_name, n_results,
+                               sections={"question": sections} if sections else None)["question"]
+
+    def query_many(self, questions: Dict[str, str], company_name: str, n_results: int = 5,
+                   sections: Optional[Dict[str, List[str]]] = None) -> Dict[str, List[Dict]]:
+        """
+        `query_chunks` for several questions at once ({name: question} -> {name: chunks}):
+        all questions are embedded and searched in one `collection.query` call, and chunks
+        found only by keyword search are fetched in one `collection.get`. `sections`
+        ({name: [section, ...]}) narrows each question to its sections: the vector search
+        is filtered to their union and each question's results to its own list.
+        """
+        start = time.perf_counter()
+        names = list(questions)
+        texts = [questions[name] for name in names]
+        sections = {name: allowed for name, allowed in (sections or {}).items() if allowed}
+
+        company = normalize_company(company_name)
+        where = {"company": company}
+        if sections and all(name in sections for name in names):
+            union = sorted({s for allowed in sections.values() for s in allowed})
+            where = {"$and": [where, {"section": {"$in": union}}]}
+        dense = self.collection.query(query_texts=texts, n_results=RETRIEVAL_CANDIDATES, where=where)
+        if "$and" in where and not any(dense['ids']):
+            # Reports indexed before section metadata existed: search them unfiltered
+            sections = {}
+            dense = self.collection.query(query_texts=texts, n_results=RETRIEVAL_CANDIDATES,
+                                          where={"company": company})
+
+        chunks = {}
+        fused_by_name = {}
+        for i, (name, question) in enumerate(zip(names, texts)):
+            for cid, doc, meta in zip(dense['ids'][i], dense['documents'][i], dense['metadatas'][i]):
+                chunks[cid] = {"id": cid, "text": doc, "metadata": meta}
+            sparse_ids = [cid for cid, _ in self.bm25.search(company, question, top_k=RETRIEVAL_CANDIDATES)]
+            fused_by_name[name] = reciprocal_rank_fusion([dense['ids'][i], sparse_ids])
+            print(f"[RAG] Query: '{question}' for '{company_name}' -> {len(dense['ids'][i])} dense / {len(sparse_ids)} keyword hits.")
+
+        missing = list(dict.fromkeys(cid for fused in fused_by_name.values() for cid, _ in fused if cid not in chunks))
+        for chunk in self.get_chunks(missing):
+            chunks[chunk["id"]] = chunk
+
+        def in_sections(name: str, chunk: Dict) -> bool:
+            allowed = sections.get(name)
+            # BM25 has no metadata filter, so keyword hits are filtered here
+            return not allowed or (chunk["metadata"] or {}).get("section") in allowed
+
+        reranker = self._get_reranker()
+        results = {}
+        for name, question in zip(names, texts):
+            ranked = [dict(chunks[cid], score=score) for cid, score in fused_by_name[name]
+                      if cid in chunks and in_sections(name, chunks[cid])]
+            if reranker and ranked:
+                candidates = ranked[:RETRIEVAL_CANDIDATES]
+                scores = reranker.predict([(question, c["text"]) for c in candidates])
+                ranked = [dict(c, score=float(s)) for c, s in sorted(zip(candidates, scores), key=lambda x: x[1], reverse=True)]
+            results[name] = ranked[:n_results]
+
+        elapsed = time.perf_counter() - start
+        metrics.RAG_QUERY_SECONDS.observe(elapsed)
+        metrics.RAG_QUERY_RESULTS.inc(sum(len(r) for r in results.values()))
+        metrics.record("rag_query", elapsed)
+        return results
+
+    def get_chunks(self, ids: List[str]) -> List[Dict]:
+        """Stored chunks by id, in the order given (unknown ids are skipped)."""
+        if not ids:
+            return []
+        found = self.collection.get(ids=list(ids))
+        by_id = {
+            cid: {"id": cid, "text": doc, "metadata": meta}
+            for cid, doc, meta in zip(found['ids'], found['documents'], found['metadatas'])
+        }
+        return [by_id[cid] for cid in ids if cid in by_id]
 
     def query_context(self, question: str, company_name: str, n_results: int = 5) -> str:
-        results = self.collection.query(
-            query_texts=[question],
-            n_results=n_results,
-            where={"company": company_name}
-        )
-        n_found = len(results['documents'][0])
-        print(f"[RAG] Query: '{question}' for '{company_name}' -> Found {n_found} docs.")
-        if n_found == 0:
+        chunks = self.query_chunks(question, company_name, n_results)
+        if not chunks:
             return ""
-        
-        docs = results['documents'][0]
-        return "\n\n---\n\n".join(docs)
-    
+        return "\n\n---\n\n".join(c["text"] for c in chunks)
+
     def clear_company(self, company_name: str):
         # Basic cleanup if needed, Chroma support for delete with where clause
         try:
-            self.collection.delete(where={"company": company_name})
+            with self._write_lock:
+                self.collection.delete(where={"company": normalize_company(company_name)})
+                self.bm25.delete_company(normalize_company(company_name))
         except:
             pass
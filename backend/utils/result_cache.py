@@ -0,0 +1,117 @@
+import time
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+from backend.config import RESULT_CACHE_DB_PATH, RESULT_CACHE_TTL_SECONDS, NEWS_CACHE_TTL_SECONDS
+from backend.models.schemas import AnalysisResult
+
+logger = logging.getLogger(__name__)
+
+def normalize_company(company_name: str) -> str:
+    return " ".join(company_name.lower().split())
+
+def report_key(file_sha256: str, company_name: str, report_type: str) -> str:
+    """
+    Content address of one analysis input. Also used as the RAG doc_id, so the
+    same report for the same company is only ever embedded once.
+    """
+    raw = f"{file_sha256}|{normalize_company(company_name)}|{report_type}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class CachedAnalysis:
+    def __init__(self, result: AnalysisResult, news_fresh: bool, evidence: Optional[Dict[str, List[str]]] = None):
+        self.result = result
+        # News goes stale much faster than a report's fundamentals
+        self.news_fresh = news_fresh
+        # Chunk ids the fundamentals stage retrieved per metric (reused by Q&A)
+        self.evidence = evidence or {}
+
+class ResultCache:
+    """SQLite cache of AnalysisResult with a separate, shorter TTL for the news component."""
+
+    def __init__(self, db_path: str = RESULT_CACHE_DB_PATH, ttl_seconds: int = RESULT_CACHE_TTL_SECONDS,
+                 news_ttl_seconds: int = NEWS_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.news_ttl_seconds = news_ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                cache_key TEXT PRIMARY KEY,
+                company TEXT NOT NULL,
+                report_type TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                news_at REAL NOT NULL,
+                evidence TEXT
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(analysis_cache)")}
+        if "evidence" not in columns:
+            self._conn.execute("ALTER TABLE analysis_cache ADD COLUMN evidence TEXT")
+        # Metrics parsed from a report's statement tables; kept as long as the report
+        # stays indexed, since re-ingestion (and re-parsing) is skipped for known doc_ids
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS statement_metrics (
+                doc_id TEXT PRIMARY KEY,
+                metrics TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, cache_key: str) -> Optional[CachedAnalysis]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at, news_at, evidence FROM analysis_cache WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+        if row is None:
+            return None
+        result_json, created_at, news_at, evidence_json = row
+        now = time.time()
+        if now - created_at > self.ttl_seconds:
+            self.delete(cache_key)
+            return None
+        return CachedAnalysis(
+            result=AnalysisResult.model_validate_json(result_json),
+            news_fresh=(now - news_at) <= self.news_ttl_seconds,
+            evidence=json.loads(evidence_json) if evidence_json else None
+        )
+
+    def put(self, cache_key: str, result: AnalysisResult, report_type: str,
+            evidence: Optional[Dict[str, List[str]]] = None):
+        now = time.time()
+        with self._lock:
+            # Keep the original created_at so refreshing the news doesn't extend the report TTL
+            self._conn.execute("""
+                INSERT INTO analysis_cache (cache_key, company, report_type, result, created_at, news_at, evidence)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    result = excluded.result, news_at = excluded.news_at, evidence = excluded.evidence
+            """, (cache_key, normalize_company(result.company_name), report_type, result.model_dump_json(),
+                  now, now, json.dumps(evidence or {})))
+            self._conn.commit()
+
+    def delete(self, cache_key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM analysis_cache WHERE cache_key = ?", (cache_key,))
+            self._conn.commit()
+
+    def get_statement_metrics(self, doc_id: str) -> Optional[Dict[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT metrics FROM statement_metrics WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_statement_metrics(self, doc_id: str, metrics: Dict[str, float]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO statement_metrics (doc_id, metrics, created_at) VALUES (?, ?, ?)",
+                (doc_id, json.dumps(metrics or {}), time.time())
+            )
+            self._conn.commit()
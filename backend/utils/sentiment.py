@@ -0,0 +1,115 @@
+import logging
+import numpy as np
+from typing import Callable, Dict, List
+from backend.config import (
+    SENTIMENT_MARGIN, NEWS_DUPLICATE_THRESHOLD, NEWS_MAX_REPRESENTATIVES
+)
+
+logger = logging.getLogger(__name__)
+
+# Prototype phrases per polarity; an article's polarity is how much closer it sits
+# to the positive prototype than to the negative one.
+POLARITY_ANCHORS = {
+    "positive": [
+        "company beats earnings expectations and raises guidance",
+        "record revenue and strong profit growth",
+        "shares surge after upbeat results",
+        "analysts upgrade the stock to buy",
+        "new contract win and expansion boosts outlook",
+        "dividend increase and share buyback announced",
+    ],
+    "negative": [
+        "company misses earnings estimates and cuts guidance",
+        "revenue decline and widening losses",
+        "shares plunge after disappointing results",
+        "analysts downgrade the stock to sell",
+        "regulatory probe, lawsuit and fraud allegations",
+        "layoffs, debt default and bankruptcy fears",
+    ],
+}
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def article_text(article: Dict) -> str:
+    return f"{article.get('title') or ''}. {article.get('description') or ''}".strip()
+
+class NewsSentimentScorer:
+    """
+    CPU-only pre-scoring of news articles with the shared embedding model.
+    Every article is embedded in one batch, labelled positive / negative / neutral
+    against anchor prototypes, and near-duplicate stories (syndicated copies,
+    rewrites) are clustered so only one representative per story needs the LLM.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List], margin: float = SENTIMENT_MARGIN,
+                 duplicate_threshold: float = NEWS_DUPLICATE_THRESHOLD):
+        self.embed_fn = embed_fn
+        self.margin = margin
+        self.duplicate_threshold = duplicate_threshold
+        self._prototypes = None
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return _normalize(np.asarray(self.embed_fn(texts), dtype=np.float32))
+
+    def prototypes(self) -> np.ndarray:
+        """(2, dim) matrix of [positive, negative] prototype directions, computed once."""
+        if self._prototypes is None:
+            rows = [self._embed(POLARITY_ANCHORS[label]).mean(axis=0) for label in ("positive", "negative")]
+            self._prototypes = _normalize(np.vstack(rows))
+        return self._prototypes
+
+    def cluster(self, vectors: np.ndarray) -> List[List[int]]:
+        """Greedy single-pass clustering: an article joins the first earlier cluster it nearly duplicates."""
+        clusters: List[List[int]] = []
+        heads: List[int] = []
+        similarities = vectors @ vectors.T
+        for i in range(len(vectors)):
+            for c, head in enumerate(heads):
+                if similarities[i, head] >= self.duplicate_threshold:
+                    clusters[c].append(i)
+                    break
+            else:
+                heads.append(i)
+                clusters.append([i])
+        return clusters
+
+    def score(self, articles: List[Dict], max_representatives: int = NEWS_MAX_REPRESENTATIVES) -> Dict:
+        """
+        Returns per-article polarity, deterministic counts, a -10..10 score and the
+        representative articles (one per story, strongest signal first).
+        """
+        vectors = self._embed([article_text(a) for a in articles])
+        similarity = vectors @ self.prototypes().T
+        polarity = similarity[:, 0] - similarity[:, 1]
+
+        labels = np.where(polarity > self.margin, "positive",
+                          np.where(polarity < -self.margin, "negative", "neutral"))
+        clusters = self.cluster(vectors)
+
+        # Each story weighs once in the score, however many outlets ran it
+        story_polarity = np.array([polarity[c].mean() for c in clusters])
+        scale = max(float(np.abs(story_polarity).max()), self.margin * 4)
+        score = int(np.clip(round(10 * story_polarity.mean() / scale), -10, 10))
+
+        order = sorted(range(len(clusters)), key=lambda c: (-len(clusters[c]), -abs(story_polarity[c])))
+        representatives = []
+        for c in order[:max_representatives]:
+            head = clusters[c][0]
+            representatives.append({
+                **articles[head],
+                "label": str(labels[head]),
+                "polarity": round(float(polarity[head]), 4),
+                "coverage": len(clusters[c]),
+            })
+
+        return {
+            "positive_count": int((labels == "positive").sum()),
+            "negative_count": int((labels == "negative").sum()),
+            "neutral_count": int((labels == "neutral").sum()),
+            "score": score,
+            "stories": len(clusters),
+            "representatives": representatives,
+        }
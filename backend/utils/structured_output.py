@@ -0,0 +1,196 @@
+import re
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+from backend.config import GEMINI_MODEL
+from backend.utils.ai_helper import llm_gateway, cache_key, PRIORITY_BATCH
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+# Model families that accept response_mime_type="application/json" (Gemma does not)
+JSON_MODE_MODEL_PREFIXES = ("models/gemini", "gemini")
+
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+class StructuredOutputError(Exception):
+    pass
+
+def json_generation_config(model_name: str) -> Optional[Dict]:
+    """
+    Generation config that constrains the model to JSON output, if the model supports it.
+    Only the output format is enforced (no response_schema); the schema itself is
+    checked by validation and, failing that, the repair round-trip.
+    """
+    if model_name.lower().startswith(JSON_MODE_MODEL_PREFIXES):
+        return {"response_mime_type": "application/json"}
+    return None
+
+def _balanced_end(text: str, start: int) -> Optional[int]:
+    """Index of the brace closing the object that opens at `start` (string-aware), or None."""
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+def extract_json(text: str) -> Dict[str, Any]:
+    """
+    First JSON object in a model response. Clean JSON parses directly; otherwise
+    markdown fences and surrounding prose are skipped by scanning for the first
+    balanced {...} that parses (trailing commas tolerated).
+    """
+    text = (text or "").strip()
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data
+    except ValueError:
+        pass
+
+    start = text.find("{")
+    while start != -1:
+        end = _balanced_end(text, start)
+        if end is None:
+            break
+        candidate = text[start:end + 1]
+        for attempt in (candidate, TRAILING_COMMA_RE.sub(r"\1", candidate)):
+            try:
+                data = json.loads(attempt)
+            except ValueError:
+                continue
+            if isinstance(data, dict):
+                return data
+        start = text.find("{", start + 1)
+    raise StructuredOutputError("No JSON object found in model output")
+
+def parse_structured(text: str, schema: Type[T], defaults: Optional[Dict] = None,
+                     overrides: Optional[Dict] = None) -> T:
+    """
+    Extracts the JSON object and validates it into `schema`. `defaults` fill keys the
+    model left out; `overrides` replace model values (e.g. numbers computed locally).
+    """
+    data = {**(defaults or {}), **extract_json(text), **(overrides or {})}
+    return schema.model_validate(data)
+
+def describe_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+def repair_prompt(schema: Type[BaseModel], text: str, error: Exception) -> str:
+    return f"""
+    The following output was supposed to be a single JSON object matching this JSON schema,
+    but it failed validation.
+
+    Schema: {json.dumps(schema.model_json_schema())}
+
+    Errors: {describe_error(error)}
+
+    Output:
+    {text[:6000]}
+
+    Return ONLY the corrected JSON object (no markdown, no commentary).
+    """
+
+class StructuredCall:
+    """
+    One schema-validated LLM call: JSON mode where available (response_mime_type
+    only; the schema is not sent to the API), tolerant parsing, and a single short
+    repair round-trip (bad output + errors only, not the original context) instead
+    of re-running the whole prompt. A repaired answer is written back to the
+    response cache under the original prompt.
+    """
+
+    def __init__(self, prompt: str, schema: Type[T], agent: Optional[str] = None,
+                 defaults: Optional[Dict] = None, overrides: Optional[Dict] = None,
+                 model_name: str = GEMINI_MODEL, priority: int = PRIORITY_BATCH):
+        self.prompt = prompt
+        self.schema = schema
+        self.agent = agent
+        self.defaults = defaults
+        self.overrides = overrides
+        self.model_name = model_name
+        self.priority = priority
+        self.generation_config = json_generation_config(model_name)
+
+    def _parse(self, text: str):
+        return parse_structured(text, self.schema, self.defaults, self.overrides)
+
+    def _remember_repair(self, repaired_text: Optional[str], latency: float = 0.0):
+        """Replaces the cached invalid answer with the repaired JSON (or drops it if repair failed)."""
+        cache = llm_gateway.cache
+        if cache is None or self.agent is None:
+            return
+        key = cache_key(self.model_name, self.prompt, self.generation_config)
+        if repaired_text is None:
+            cache.delete(key)
+        else:
+            # Store only the repaired JSON so a replay skips both calls
+            cache.put(key, self.agent, self.model_name, json.dumps(extract_json(repaired_text)), latency)
+
+    def run(self) -> T:
+        start = time.perf_counter()
+        response = llm_gateway.generate_sync(self.prompt, model=llm_gateway.get_model(self.model_name),
+                                             priority=self.priority, agent=self.agent,
+                                             generation_config=self.generation_config)
+        try:
+            return self._parse(response.text)
+        except (StructuredOutputError, ValidationError) as e:
+            logger.warning(f"{self.schema.__name__} output invalid, repairing: {describe_error(e)}")
+            repaired = llm_gateway.generate_sync(repair_prompt(self.schema, response.text, e),
+                                                 model=llm_gateway.get_model(self.model_name),
+                                                 priority=self.priority, generation_config=self.generation_config)
+            try:
+                result = self._parse(repaired.text)
+            except Exception:
+                self._remember_repair(None)
+                raise
+            self._remember_repair(repaired.text, time.perf_counter() - start)
+            return result
+
+    async def arun(self) -> T:
+        start = time.perf_counter()
+        response = await llm_gateway.generate(self.prompt, self.model_name, priority=self.priority,
+                                              agent=self.agent, generation_config=self.generation_config)
+        try:
+            return self._parse(response.text)
+        except (StructuredOutputError, ValidationError) as e:
+            logger.warning(f"{self.schema.__name__} output invalid, repairing: {describe_error(e)}")
+            repaired = await llm_gateway.generate(repair_prompt(self.schema, response.text, e), self.model_name,
+                                                  priority=self.priority, generation_config=self.generation_config)
+            try:
+                result = self._parse(repaired.text)
+            except Exception:
+                await asyncio.to_thread(self._remember_repair, None)
+                raise
+            await asyncio.to_thread(self._remember_repair, repaired.text, time.perf_counter() - start)
+            return result
+
+def generate_structured(prompt: str, schema: Type[T], agent: Optional[str] = None, **kwargs) -> T:
+    """Blocking schema-validated generation (for agents running in worker threads)."""
+    return StructuredCall(prompt, schema, agent=agent, **kwargs).run()
+
+async def agenerate_structured(prompt: str, schema: Type[T], agent: Optional[str] = None, **kwargs) -> T:
+    """Awaitable schema-validated generation."""
+    return await StructuredCall(prompt, schema, agent=agent, **kwargs).arun()
@@ -1,55 +1,149 @@
+import re
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
+
+# (pattern, weight) per statement type; compiled once at import
+STATEMENT_KEYWORDS = {
+    'balance_sheet': [
+        (r'balance sheet', 3), (r'total assets', 2), (r'liabilities', 1),
+        (r'\bequity\b', 1), (r'borrowings', 1), (r'share capital', 1),
+    ],
+    'income_statement': [
+        (r'profit (and|&) loss|income statement', 3), (r'revenue from operations|total income', 2),
+        (r'profit (for|after)', 2), (r'\bexpenses\b', 1), (r'\btax\b', 1), (r'\brevenue\b', 1),
+    ],
+    'cash_flow': [
+        (r'cash flows?', 3), (r'operating activities', 2),
+        (r'investing activities', 1), (r'financing activities', 1),
+    ],
+}
+STATEMENT_SCORERS = {
+    kind: [(re.compile(pattern), weight) for pattern, weight in keywords]
+    for kind, keywords in STATEMENT_KEYWORDS.items()
+}
+MIN_STATEMENT_SCORE = 3
+
+# Row labels used to compute metrics
+ROW_PATTERNS = {
+    'revenue': r'revenue from operations|total revenue|net sales|turnover|^revenue|^total income',
+    'net_profit': r'profit for the (?:year|period)|net profit|profit after tax',
+    'equity': r'total equity|shareholders.? funds|net worth',
+    'borrowings': r'borrowings',
+}
+
+# Currency markers, thousands separators (incl. Indian lakh/crore grouping), % signs, whitespace
+NUMERIC_NOISE = r'(?i)₹|rs\.?|inr|\$|,|%|\s'
+
+def parse_numeric(series: pd.Series) -> pd.Series:
+    """Vectorized conversion of statement cells like '1,23,456.7', '(2,345)', '12.5%' or '-' to floats."""
+    s = series.astype(str).str.strip()
+    negative = s.str.match(r'^\(.*\)$')
+    cleaned = s.str.replace(NUMERIC_NOISE, '', regex=True).str.strip('()')
+    values = pd.to_numeric(cleaned, errors='coerce')
+    return pd.Series(np.where(negative, -values.abs(), values), index=series.index)
 
 class FinancialTableExtractor:
     def clean_dataframe(self, data: List[List[str]]) -> pd.DataFrame:
         """Converts list of lists to cleaned DataFrame."""
         if not data:
             return pd.DataFrame()
-        
+
         # Assume first row is header
         headers = data[0]
         rows = data[1:]
-        
-        # Handle duplicate headers if any
+
+        # Handle empty / duplicate headers if any
         headers = [h if h else f"Col_{i}" for i, h in enumerate(headers)]
-        
+        headers = [h if headers.index(h) == i else f"{h}_{i}" for i, h in enumerate(headers)]
+
         df = pd.DataFrame(rows, columns=headers)
         return df
 
+    def score_table(self, data: List[List[str]]) -> Tuple[Optional[str], int]:
+        """Returns (statement_type, score) for the best matching type, or (None, 0)."""
+        content = " ".join(" ".join(cell for cell in row if cell) for row in data).lower()
+        best_kind, best_score = None, 0
+        for kind, scorers in STATEMENT_SCORERS.items():
+            score = sum(weight for pattern, weight in scorers if pattern.search(content))
+            if score > best_score:
+                best_kind, best_score = kind, score
+        if best_score < MIN_STATEMENT_SCORE:
+            return None, 0
+        return best_kind, best_score
+
     def identify_financial_tables(self, tables: List[Dict[str, Any]]) -> Dict[str, pd.DataFrame]:
-        """Heuristic to identify key statements."""
-        identified = {
-            'balance_sheet': None,
-            'income_statement': None,
-            'cash_flow': None
-        }
-        
+        """Keyword-scores every table and builds DataFrames only for the best match per statement."""
+        best = {kind: (0, None) for kind in STATEMENT_SCORERS}
         for table_info in tables:
-            data = table_info['data']
-            # Flatten to string to search keywords
-            content_str = str(data).lower()
-            
-            df = self.clean_dataframe(data)
-            
-            # Simple keyword scoring
-            if 'balance sheet' in content_str or ('assets' in content_str and 'liabilities' in content_str):
-                if identified['balance_sheet'] is None: # take first match
-                    identified['balance_sheet'] = df
-            
-            elif 'profit' in content_str and 'loss' in content_str and 'revenue' in content_str:
-                if identified['income_statement'] is None:
-                    identified['income_statement'] = df
-            
-            elif 'cash flow' in content_str and 'operating' in content_str:
-                if identified['cash_flow'] is None:
-                    identified['cash_flow'] = df
-                    
-        return identified
+            kind, score = self.score_table(table_info['data'])
+            if kind and score > best[kind][0]:
+                best[kind] = (score, table_info['data'])
+
+        return {
+            kind: self.clean_dataframe(data) if data is not None else None
+            for kind, (_, data) in best.items()
+        }
+
+    def to_numeric_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """First column as lowercase row label, value columns parsed to floats ('Note' columns dropped)."""
+        value_cols = [c for c in df.columns[1:] if 'note' not in str(c).lower()]
+        numeric = df[value_cols].apply(parse_numeric)
+        numeric.insert(0, 'label', df.iloc[:, 0].astype(str).str.strip().str.lower())
+        return numeric
+
+    def _row_values(self, numeric: pd.DataFrame, pattern: str, sum_all: bool = False) -> Optional[Tuple[float, float]]:
+        """(current, previous) values of the first row matching `pattern`; previous may be NaN."""
+        rows = numeric[numeric['label'].str.contains(pattern, regex=True, na=False)].iloc[:, 1:]
+        rows = rows[rows.notna().any(axis=1)]
+        if rows.empty:
+            return None
+        if sum_all:
+            # e.g. non-current + current borrowings; skip sub-totals if an explicit total exists
+            totals = rows[numeric.loc[rows.index, 'label'].str.contains('total')]
+            rows = totals if not totals.empty else rows
+            values = rows.sum(axis=0, min_count=1).dropna().to_numpy()
+        else:
+            values = rows.iloc[0].dropna().to_numpy()
+        if values.size == 0:
+            return None
+        return float(values[0]), float(values[1]) if values.size > 1 else float('nan')
+
+    def compute_metrics(self, statements: Dict[str, pd.DataFrame]) -> Dict[str, float]:
+        """
+        Computes revenue growth, profit margin, ROE (%) and debt-to-equity from the
+        income statement and balance sheet. Only metrics that could be derived are returned.
+        """
+        metrics: Dict[str, float] = {}
+        income = statements.get('income_statement')
+        balance = statements.get('balance_sheet')
+
+        revenue = profit = equity = borrowings = None
+        if income is not None and not income.empty:
+            income_num = self.to_numeric_frame(income)
+            revenue = self._row_values(income_num, ROW_PATTERNS['revenue'])
+            profit = self._row_values(income_num, ROW_PATTERNS['net_profit'])
+        if balance is not None and not balance.empty:
+            balance_num = self.to_numeric_frame(balance)
+            equity = self._row_values(balance_num, ROW_PATTERNS['equity'])
+            borrowings = self._row_values(balance_num, ROW_PATTERNS['borrowings'], sum_all=True)
+
+        if revenue:
+            cur, prev = revenue
+            if not np.isnan(prev) and prev != 0:
+                metrics['revenue_growth'] = round((cur - prev) / abs(prev) * 100, 2)
+            if profit and cur:
+                metrics['profit_margin'] = round(profit[0] / cur * 100, 2)
+        if equity and equity[0] > 0:
+            if profit:
+                metrics['roe'] = round(profit[0] / equity[0] * 100, 2)
+            if borrowings:
+                metrics['debt_to_equity'] = round(borrowings[0] / equity[0], 2)
+        return metrics
 
     def table_to_text(self, df: pd.DataFrame, table_type: str) -> str:
         """Converts table to LLM-readable text."""
         if df is None or df.empty:
             return ""
-        
+
         return f"--- {table_type.replace('_', ' ').upper()} ---\n" + df.to_string()
@@ -0,0 +1,150 @@
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+from backend.config import QUEUE_DB_PATH, TASK_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class TaskFailed(Exception):
+    pass
+
+class TaskQueue:
+    """
+    Local, brokerless job queue on SQLite. The web process enqueues tasks and
+    awaits their results; worker processes (see backend/worker.py) claim them.
+    Tasks held by a worker for longer than the timeout are re-queued, so a
+    crashed worker doesn't lose work; a waiter gives up after the same timeout.
+    """
+
+    def __init__(self, db_path: str = QUEUE_DB_PATH, task_timeout: int = TASK_TIMEOUT_SECONDS):
+        self.task_timeout = task_timeout
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks(status, created_at)")
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        task_id = str(uuid.uuid4())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tasks (task_id, kind, payload, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (task_id, kind, json.dumps(payload), time.time())
+            )
+        return task_id
+
+    def claim(self, worker_id: str) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """Atomically takes the oldest queued task. Returns (task_id, kind, payload) or None."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Recover tasks from workers that died mid-task
+                self._conn.execute(
+                    "UPDATE tasks SET status = 'queued', worker = NULL WHERE status = 'running' AND started_at < ?",
+                    (now - self.task_timeout,)
+                )
+                row = self._conn.execute(
+                    "SELECT task_id, kind, payload FROM tasks WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE tasks SET status = 'running', worker = ?, started_at = ? WHERE task_id = ?",
+                    (worker_id, now, row[0])
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row[0], row[1], json.loads(row[2])
+
+    def complete(self, task_id: str, result: Any):
+        # A task its waiter already gave up on stays failed; nobody would collect the result
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?, finished_at = ? WHERE task_id = ? AND status != 'failed'",
+                (json.dumps(result), time.time(), task_id)
+            )
+
+    def fail(self, task_id: str, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tasks SET status = 'failed', error = ?, finished_at = ? WHERE task_id = ?",
+                (error, time.time(), task_id)
+            )
+
+    def release(self, worker_id: str) -> int:
+        """Re-queues the tasks a dead worker was running. Returns how many were released."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = 'queued', worker = NULL, started_at = NULL "
+                "WHERE status = 'running' AND worker = ?",
+                (worker_id,)
+            )
+        return cursor.rowcount
+
+    def _status(self, task_id: str) -> Optional[Tuple[str, Optional[str], Optional[str]]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT status, result, error FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+
+    async def wait(self, task_id: str, poll_interval: float = 0.5, timeout: Optional[float] = None) -> Any:
+        """
+        Waits for a task without blocking the event loop; returns its result or raises
+        TaskFailed, also when the task isn't done within `timeout` (default: the task timeout).
+        """
+        deadline = time.monotonic() + (timeout if timeout is not None else self.task_timeout)
+        while True:
+            row = await asyncio.to_thread(self._status, task_id)
+            if row is None:
+                raise TaskFailed(f"Task {task_id} disappeared")
+            status, result, error = row
+            if status == "done":
+                # Results are consumed once; drop the (possibly large) payload
+                await asyncio.to_thread(self.delete, task_id)
+                return await asyncio.to_thread(json.loads, result)
+            if status == "failed":
+                await asyncio.to_thread(self.delete, task_id)
+                raise TaskFailed(error or "Task failed")
+            if time.monotonic() >= deadline:
+                error = f"Task {task_id} timed out while {status}"
+                await asyncio.to_thread(self.fail, task_id, error)
+                raise TaskFailed(error)
+            await asyncio.sleep(poll_interval)
+
+    def delete(self, task_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+
+    def depth(self) -> Dict[str, Any]:
+        """Queue metrics: task counts by status and age of the oldest queued task."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+            oldest = self._conn.execute("SELECT MIN(created_at) FROM tasks WHERE status = 'queued'").fetchone()[0]
+        counts = {status: count for status, count in rows}
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "oldest_queued_seconds": round(time.time() - oldest, 1) if oldest else 0.0,
+        }
@@ -0,0 +1,112 @@
+import os
+import asyncio
+import hashlib
+import logging
+from typing import Iterable, Tuple
+from fastapi import UploadFile
+from starlette.types import ASGIApp, Receive, Scope, Send
+from backend.config import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# The PDF header must appear within the first 1024 bytes of the file
+PDF_MAGIC = b"%PDF-"
+PDF_HEADER_WINDOW = 1024
+
+class UploadRejected(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+async def save_upload(upload: UploadFile, dest_path: str, max_bytes: int = MAX_UPLOAD_BYTES,
+                      chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, int]:
+    """
+    Copies an upload to disk in chunks without holding it in memory or blocking the
+    event loop. The SHA-256 is computed on the way (ready for dedup), the PDF magic
+    bytes are checked on the first chunk and the size limit is enforced mid-stream.
+    Returns (sha256_hex, size_bytes); the partial file is removed on rejection.
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    f = await asyncio.to_thread(open, dest_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            if size == 0 and PDF_MAGIC not in chunk[:PDF_HEADER_WINDOW]:
+                raise UploadRejected(415, "Uploaded file is not a PDF")
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadRejected(413, f"File exceeds the {max_bytes // (1024 * 1024)} MB limit")
+            hasher.update(chunk)
+            await asyncio.to_thread(f.write, chunk)
+        if size == 0:
+            raise UploadRejected(400, "Uploaded file is empty")
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    await asyncio.to_thread(f.close)
+    return hasher.hexdigest(), size
+
+class UploadLimitMiddleware:
+    """
+    Rejects oversized request bodies on upload routes before they are parsed:
+    immediately from Content-Length when present, otherwise as soon as the
+    streamed body crosses the limit.
+    """
+
+    def __init__(self, app: ASGIApp, paths: Iterable[str], max_bytes: int = MAX_UPLOAD_BYTES,
+                 multipart_overhead: int = 64 * 1024):
+        self.app = app
+        self.paths = tuple(paths)
+        self.limit = max_bytes + multipart_overhead
+
+    async def _reject(self, send: Send, status_code: int, detail: str):
+        body = ('{"detail": "%s"}' % detail).encode("utf-8")
+        await send({"type": "http.response.start", "status": status_code,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.limit:
+            await self._reject(send, 413, "Request body too large")
+            return
+
+        received = 0
+        too_large = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    too_large = True
+                    raise UploadRejected(413, "Request body too large")
+            return message
+
+        async def guarded_send(message):
+            # Once over the limit, the app's own error response (e.g. a 400 from the
+            # form parser) is replaced by our 413
+            if not too_large:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not too_large:
+                raise
+        if too_large:
+            logger.warning(f"Rejected upload on {scope['path']}: body over {self.limit} bytes")
+            await self._reject(send, 413, "Request body too large")
@@ -0,0 +1,113 @@
+"""
+Worker processes for CPU-heavy analysis stages.
+
+Run standalone (WORKER_MODE=external):
+    python -m backend.worker --concurrency 2
+
+With WORKER_MODE=embedded (default) the web app starts these itself.
+"""
+import os
+import time
+import signal
+import logging
+import argparse
+import traceback
+import multiprocessing
+from typing import Callable, List, Optional
+from backend.config import WORKER_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+def _prepare_report(payload):
+    # Imported lazily: keeps the parent light and loads the embedding model once per worker
+    from backend.agents.fundamental_analyzer import FundamentalAnalyzer
+    return FundamentalAnalyzer.prepare_report(payload["pdf_path"], payload.get("company_name"),
+                                              payload.get("known_ids", ()))
+
+TASK_HANDLERS = {
+    "prepare_report": _prepare_report,
+}
+
+def run_worker(worker_id: str, poll_interval: float = 0.5):
+    from backend.utils.task_queue import TaskQueue
+
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("pdfminer").setLevel(logging.ERROR)
+    queue = TaskQueue()
+    running = True
+
+    def stop(*_):
+        nonlocal running
+        running = False
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info(f"Worker {worker_id} started (pid {os.getpid()})")
+
+    while running:
+        task = queue.claim(worker_id)
+        if task is None:
+            time.sleep(poll_interval)
+            continue
+        task_id, kind, payload = task
+        start = time.perf_counter()
+        try:
+            handler = TASK_HANDLERS[kind]
+            queue.complete(task_id, handler(payload))
+            logger.info(f"Worker {worker_id}: {kind} {task_id} done in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            traceback.print_exc()
+            queue.fail(task_id, f"{type(e).__name__}: {e}")
+
+    logger.info(f"Worker {worker_id} stopped")
+
+def worker_id(index: int) -> str:
+    return f"worker-{os.getpid()}-{index}"
+
+def _start_worker(index: int) -> multiprocessing.Process:
+    # spawn: never fork the multi-threaded web process. Not daemonic, so workers may
+    # use their own process pools for page-parallel PDF parsing.
+    ctx = multiprocessing.get_context("spawn")
+    p = ctx.Process(target=run_worker, args=(worker_id(index),), name=f"analysis-worker-{index}")
+    p.start()
+    return p
+
+def start_worker_pool(concurrency: int = WORKER_CONCURRENCY) -> List[multiprocessing.Process]:
+    return [_start_worker(i) for i in range(concurrency)]
+
+def respawn_dead_workers(processes: List[multiprocessing.Process],
+                         on_exit: Optional[Callable[[str], None]] = None) -> List[str]:
+    """
+    Replaces exited workers in place. `on_exit(worker_id)` runs before the replacement
+    (which reuses the id) starts, e.g. to re-queue the dead worker's tasks.
+    Returns the ids of the workers that died.
+    """
+    dead = []
+    for i, p in enumerate(processes):
+        if p.is_alive():
+            continue
+        logger.warning(f"Worker {worker_id(i)} exited with code {p.exitcode}; respawning")
+        p.join(0)
+        if on_exit is not None:
+            on_exit(worker_id(i))
+        processes[i] = _start_worker(i)
+        dead.append(worker_id(i))
+    return dead
+
+def stop_worker_pool(processes: List[multiprocessing.Process], timeout: float = 10):
+    for p in processes:
+        p.terminate()
+    for p in processes:
+        p.join(timeout)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run analysis worker processes")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    workers = start_worker_pool(args.concurrency)
+    try:
+        for w in workers:
+            w.join()
+    except KeyboardInterrupt:
+        stop_worker_pool(workers)
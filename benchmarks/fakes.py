@@ -0,0 +1,183 @@
+"""
+Deterministic offline stand-ins for Gemini, NewsAPI and the embedding model.
+
+Each fake sleeps for a configurable latency and derives its output from a hash
+of the input, so runs are reproducible and exercise the same code paths
+(JSON parsing, caching, dedup) as live services.
+"""
+import re
+import json
+import time
+import asyncio
+import hashlib
+import numpy as np
+from typing import Dict, List
+from chromadb.api.types import EmbeddingFunction
+
+def _seed(text: str) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+# --- LLM ---
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.parts = [text]
+
+class FakeStream:
+    """Async iterator of word chunks, mimicking `generate_content_async(stream=True)`."""
+    def __init__(self, text: str, chunk_delay: float):
+        self._words = re.findall(r"\S+\s*", text)
+        self._delay = chunk_delay
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for i in range(0, len(self._words), 4):
+            await asyncio.sleep(self._delay)
+            yield FakeResponse("".join(self._words[i:i + 4]))
+
+def fake_reply(prompt: str) -> str:
+    """Canned, schema-valid answer for each agent prompt, varied by the prompt hash."""
+    s = _seed(prompt)
+    lowered = prompt.lower()
+    if "supposed to be a single json object" in lowered:
+        return "{}"
+    if "contrarian investment analyst" in lowered:
+        signal = ["Strong Buy", "Buy", "Hold", "Avoid"][s % 4]
+        return json.dumps({
+            "signal_type": signal, "signal_strength": s % 11, "confidence": ["High", "Medium", "Low"][s % 3],
+            "summary": f"{signal}: sentiment and fundamentals diverge moderately.",
+            "opportunity_reasons": ["Strong balance sheet", "Temporary negative news"],
+            "risk_factors": ["Input cost inflation", "Regulatory overhang"],
+            "management_outlook": "Focus on capacity expansion.", "future_development": "New product launches.",
+            "timeframe": "3-6 months", "entry_strategy": "Staggered buying",
+        })
+    if "news sentiment" in lowered:
+        return json.dumps({
+            "score": (s % 21) - 10, "key_themes": ["Earnings", "Guidance", "Regulation"],
+            "panic_level": ["low", "medium", "high"][s % 3],
+        })
+    if '"revenue_growth"' in prompt:
+        return "```json\n" + json.dumps({
+            "revenue_growth": round((s % 300) / 10 - 5, 1), "profit_margin": round((s % 200) / 10, 1),
+            "roe": round((s % 250) / 10, 1), "debt_to_equity": round((s % 150) / 100, 2),
+            "health_score": s % 11, "strengths": ["Consistent growth"], "concerns": ["Rising costs"],
+        }) + "\n```"
+    if "comparison summary" in lowered:
+        return "The company sits mid-pack against its peers, ahead on margins but behind on growth."
+    return ("Based on the report context, revenue grew on higher volumes while margins were stable; "
+            "management highlighted capacity expansion and lower borrowings as priorities for the year.")
+
+class FakeGenerativeModel:
+    """Drop-in for `genai.GenerativeModel` with a fixed per-call latency."""
+    latency = 0.2          # seconds per call
+    stream_chunk_delay = 0.01
+    calls = 0
+
+    def __init__(self, model_name: str = "models/fake", **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        FakeGenerativeModel.calls += 1
+        time.sleep(self.latency)
+        return FakeResponse(fake_reply(str(prompt)))
+
+    async def generate_content_async(self, prompt, stream: bool = False, generation_config=None, **kwargs):
+        FakeGenerativeModel.calls += 1
+        await asyncio.sleep(self.latency)
+        text = fake_reply(str(prompt))
+        if stream:
+            return FakeStream(text, self.stream_chunk_delay)
+        return FakeResponse(text)
+
+# --- News ---
+
+HEADLINE_TEMPLATES = [
+    "{company} beats quarterly estimates as margins expand",
+    "{company} shares fall after regulator opens probe",
+    "{company} announces capacity expansion in new plant",
+    "Analysts downgrade {company} on slowing demand",
+    "{company} wins large export order",
+    "{company} board approves dividend and buyback",
+    "{company} faces lawsuit over supply contract",
+    "{company} to host investor day next month",
+]
+
+class FakeNewsAPIClient:
+    """Stands in for `NewsAPIClient`; returns ~20 articles, including syndicated duplicates."""
+    latency = 0.1
+
+    def __init__(self, api_key: str = None, timeout: float = None):
+        self.api_key = api_key
+
+    async def fetch_news(self, http, company_name: str, days: int = 7) -> List[Dict]:
+        await asyncio.sleep(self.latency)
+        s = _seed(company_name)
+        articles = []
+        for i in range(20):
+            template = HEADLINE_TEMPLATES[(s + i) % len(HEADLINE_TEMPLATES)]
+            title = template.format(company=company_name)
+            outlet = ["Reuters", "Bloomberg", "Mint", "CNBC", "Economic Times"][i % 5]
+            articles.append({
+                "title": f"{title} - {outlet}" if i >= len(HEADLINE_TEMPLATES) else title,
+                "description": f"{title}. Coverage from {outlet}.",
+                "url": f"https://news.example.com/{s % 1000}/{i}",
+                "published_at": "2025-01-01T00:00:00Z",
+                "source": outlet,
+            })
+        return articles
+
+# --- Embeddings ---
+
+class FakeEmbeddingFunction(EmbeddingFunction):
+    """
+    Hashed bag-of-words vectors (dim 384): cheap, deterministic, and similar texts
+    still land close together, so retrieval, dedup and the answer cache behave
+    sensibly. `latency_per_text` simulates model cost.
+    """
+    dim = 384
+    latency_per_text = 0.0005
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        if self.latency_per_text:
+            time.sleep(self.latency_per_text * len(input))
+        vectors = []
+        for text in input:
+            v = np.zeros(self.dim, dtype=np.float32)
+            for word in re.findall(r"[a-z0-9]+", text.lower()):
+                v[_seed(word) % self.dim] += 1.0
+            norm = np.linalg.norm(v)
+            vectors.append(v / norm if norm else v)
+        return vectors
+
+    @staticmethod
+    def name():
+        return "default"
+
+    def get_config(self):
+        return {}
+
+    @staticmethod
+    def build_from_config(config):
+        return FakeEmbeddingFunction()
+
+def install_fakes(llm_latency: float, news_latency: float, embed_latency: float):
+    """Patches the live clients with the fakes. Call before the app's lifespan starts."""
+    import google.generativeai as genai
+    import backend.utils.rag as rag
+    import backend.utils.api_clients as api_clients
+    from backend.utils.ai_helper import llm_gateway
+
+    FakeGenerativeModel.latency = llm_latency
+    FakeNewsAPIClient.latency = news_latency
+    FakeEmbeddingFunction.latency_per_text = embed_latency
+
+    genai.GenerativeModel = FakeGenerativeModel
+    llm_gateway._models.clear()
+    api_clients.NewsAPIClient = FakeNewsAPIClient
+    rag.make_embedding_function = FakeEmbeddingFunction
@@ -0,0 +1,333 @@
+"""
+End-to-end benchmark of the analysis pipeline with offline fakes for Gemini,
+NewsAPI and the embedding model (see benchmarks/fakes.py), on synthetic
+annual reports (see benchmarks/synthetic_pdf.py).
+
+    python -m benchmarks.run_benchmark --jobs 8 --concurrency 4 --pages 20,80
+    python -m benchmarks.run_benchmark --json out.json --baseline last.json
+
+Reports per-stage timings (PDF parsing, RAG ingest/query, each agent) for
+standalone calls and under load, plus jobs/minute for N concurrent
+/api/analyze submissions against an in-process server. With --baseline, exits
+non-zero if throughput or a stage mean regressed beyond --tolerance.
+"""
+import io
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import inspect
+import logging
+import argparse
+import tempfile
+import threading
+import contextlib
+import statistics
+from collections import defaultdict
+from typing import Dict, List
+
+def configure_environment(workdir: str, args):
+    """Points every store at a scratch directory. Must run before any backend import."""
+    os.environ.update({
+        "JOB_DB_PATH": os.path.join(workdir, "jobs.db"),
+        "RESULT_CACHE_DB_PATH": os.path.join(workdir, "cache.db"),
+        "QUEUE_DB_PATH": os.path.join(workdir, "queue.db"),
+        "PEER_DB_PATH": os.path.join(workdir, "peers.db"),
+        "LLM_CACHE_DB_PATH": os.path.join(workdir, "llm_cache.db"),
+        # Fakes are patched into this process only, so stages must not run in spawned workers
+        "WORKER_MODE": "inline",
+        "NEWS_API_KEY": "benchmark",
+        "NEWS_RSS_FEEDS": "",
+        "EMBEDDING_MODEL": "",
+        "RERANK_MODEL": "",
+        "LLM_REQUESTS_PER_MINUTE": str(args.rpm),
+        "LLM_TOKENS_PER_MINUTE": "0",
+    })
+    if not args.llm_cache:
+        # Every job pays for its model calls unless cache effects are what's being measured
+        os.environ["LLM_CACHE_TTLS"] = "news=0,fundamentals=0,peers=0,signal=0"
+    # Relative paths (the Chroma directory) land in the scratch dir too
+    os.chdir(workdir)
+
+class StageTimings:
+    """Collects wall-clock samples per label from wrapped methods (sync, async or generator)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def record(self, label: str, seconds: float):
+        with self._lock:
+            self.samples[label].append(seconds)
+
+    def wrap(self, owner, attr: str, label: str):
+        original = getattr(owner, attr)
+        timings = self
+
+        if asyncio.iscoroutinefunction(original):
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    timings.record(label, time.perf_counter() - start)
+        elif inspect.isgeneratorfunction(original):
+            def wrapper(*args, **kwargs):
+                # Only time spent producing items counts, not the consumer's work in between
+                gen = original(*args, **kwargs)
+                spent = 0.0
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = next(gen)
+                        except StopIteration:
+                            break
+                        finally:
+                            spent += time.perf_counter() - start
+                        yield item
+                finally:
+                    timings.record(label, spent)
+        else:
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    timings.record(label, time.perf_counter() - start)
+
+        wrapper.__wrapped__ = original
+        setattr(owner, attr, wrapper)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        rows = {}
+        with self._lock:
+            for label, values in sorted(self.samples.items()):
+                ordered = sorted(values)
+                rows[label] = {
+                    "calls": len(values),
+                    "total_s": round(sum(values), 3),
+                    "mean_ms": round(statistics.mean(values) * 1000, 1),
+                    "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                    "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+                }
+        return rows
+
+def instrument(timings: StageTimings):
+    from backend.utils.pdf_parser import PDFParser
+    from backend.utils.rag import FinancialRAG
+    from backend.utils.api_clients import NewsAggregator
+    from backend.agents.news_analyzer import NewsAnalyzer
+    from backend.agents.fundamental_analyzer import FundamentalAnalyzer
+    from backend.agents.peer_comparator import PeerComparator
+    from backend.agents.signal_generator import SignalGenerator
+
+    timings.wrap(PDFParser, "iter_pages", "pdf.iter_pages")
+    timings.wrap(PDFParser, "extract_text", "pdf.extract_text")
+    timings.wrap(FinancialRAG, "add_document", "rag.add_document")
+    timings.wrap(FinancialRAG, "add_chunks", "rag.add_chunks")
+    timings.wrap(FinancialRAG, "query_chunks", "rag.query_chunks")
+    timings.wrap(FinancialRAG, "query_many", "rag.query_many")
+    timings.wrap(FinancialRAG, "query_context", "rag.query_context")
+    timings.wrap(NewsAggregator, "fetch_news", "news.fetch")
+    timings.wrap(FundamentalAnalyzer, "process_and_store", "agent.ingest")
+    timings.wrap(NewsAnalyzer, "analyze", "agent.news")
+    timings.wrap(FundamentalAnalyzer, "analyze", "agent.fundamentals")
+    timings.wrap(PeerComparator, "analyze", "agent.peers")
+    timings.wrap(SignalGenerator, "generate_signal", "agent.signal")
+
+def run_standalone(sizes: List[int], workdir: str, statements: bool) -> StageTimings:
+    """Parser and RAG calls in isolation, one synthetic report per size."""
+    from benchmarks.synthetic_pdf import write_annual_report
+    from backend.utils.pdf_parser import PDFParser
+    from backend.utils.rag import FinancialRAG
+
+    timings = StageTimings()
+    rag = FinancialRAG(persist_dir=os.path.join(workdir, "standalone_chroma"))
+    for pages in sizes:
+        company = f"Standalone {pages}p"
+        path = write_annual_report(os.path.join(workdir, f"standalone_{pages}.pdf"), company, pages,
+                                   statements=statements)
+        start = time.perf_counter()
+        text = PDFParser(path).extract_text()
+        timings.record(f"pdf.extract_text[{pages}p]", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rag.add_document(text, company, "annual", doc_id=f"standalone-{pages}")
+        timings.record(f"rag.add_document[{pages}p]", time.perf_counter() - start)
+
+        for question in ("revenue growth and margins", "debt and borrowings", "management outlook"):
+            start = time.perf_counter()
+            rag.query_context(question, company)
+            timings.record(f"rag.query_context[{pages}p]", time.perf_counter() - start)
+    return timings
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def run_load(args, sizes: List[int], workdir: str) -> Dict:
+    """N /api/analyze submissions, at most `concurrency` in flight, against an in-process server."""
+    import httpx
+    import uvicorn
+    from benchmarks.synthetic_pdf import write_annual_report
+    from backend.config import UPLOAD_DIR
+    from backend.main import app
+
+    reports = []
+    for i in range(args.jobs):
+        pages = sizes[i % len(sizes)]
+        company = f"BenchCo {i:03d}"
+        path = write_annual_report(os.path.join(workdir, f"load_{i:03d}.pdf"), company, pages,
+                                   seed=args.seed, statements=not args.text_only)
+        reports.append((company, pages, path))
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    job_ids = []
+
+    async def submit(client: httpx.AsyncClient, company: str, pages: int, path: str) -> Dict:
+        async with semaphore:
+            start = time.perf_counter()
+            with open(path, "rb") as fh:
+                body = fh.read()
+            resp = await client.post("/api/analyze", data={"company_name": company, "report_type": "annual"},
+                                     files={"main_report": (os.path.basename(path), body, "application/pdf")})
+            resp.raise_for_status()
+            job_id = resp.json()["job_id"]
+            job_ids.append(job_id)
+            while True:
+                status = (await client.get(f"/api/status/{job_id}")).json()
+                if status["status"] in ("completed", "failed"):
+                    break
+                await asyncio.sleep(args.poll_interval)
+            return {"company": company, "pages": pages, "status": status["status"],
+                    "latency_s": time.perf_counter() - start, "error": status.get("error")}
+
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(submit(client, *r) for r in reports))
+            wall = time.perf_counter() - start
+    finally:
+        server.should_exit = True
+        await serve_task
+        for job_id in job_ids:
+            path = os.path.join(UPLOAD_DIR, f"{job_id}.pdf")
+            if os.path.exists(path):
+                os.remove(path)
+
+    latencies = sorted(r["latency_s"] for r in results)
+    return {
+        "jobs": len(results),
+        "concurrency": args.concurrency,
+        "completed": sum(r["status"] == "completed" for r in results),
+        "failed": [r for r in results if r["status"] != "completed"],
+        "wall_s": round(wall, 2),
+        "jobs_per_minute": round(len(results) / wall * 60, 2),
+        "latency_p50_s": round(latencies[len(latencies) // 2], 2),
+        "latency_p95_s": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+    }
+
+def print_table(title: str, rows: Dict[str, Dict[str, float]]):
+    print(f"\n{title}")
+    print(f"{'stage':<34}{'calls':>7}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, r in rows.items():
+        print(f"{label:<34}{r['calls']:>7}{r['total_s']:>10}{r['mean_ms']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}")
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regressions beyond `tolerance` (fractional) in throughput or any stage mean."""
+    problems = []
+    old_rate, new_rate = baseline["load"]["jobs_per_minute"], report["load"]["jobs_per_minute"]
+    if new_rate < old_rate * (1 - tolerance):
+        problems.append(f"jobs/minute {new_rate} < baseline {old_rate}")
+    for section in ("standalone", "under_load"):
+        for label, row in report[section].items():
+            old = baseline.get(section, {}).get(label)
+            if old and row["mean_ms"] > old["mean_ms"] * (1 + tolerance):
+                problems.append(f"{section}.{label} mean {row['mean_ms']}ms > baseline {old['mean_ms']}ms")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark")
+    parser.add_argument("--jobs", type=int, default=8, help="number of /api/analyze submissions")
+    parser.add_argument("--concurrency", type=int, default=4, help="submissions in flight at once")
+    parser.add_argument("--pages", default="20,80", help="comma-separated synthetic report sizes")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per fake LLM call")
+    parser.add_argument("--news-latency", type=float, default=0.1, help="seconds per fake NewsAPI call")
+    parser.add_argument("--embed-latency", type=float, default=0.0005, help="seconds per embedded text")
+    parser.add_argument("--rpm", type=int, default=100000, help="LLM requests/minute limit to enforce")
+    parser.add_argument("--llm-cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--text-only", action="store_true",
+                        help="omit statement tables so fundamentals go through RAG + LLM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    parser.add_argument("--baseline", help="earlier --json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression, e.g. 0.2 = 20%%")
+    parser.add_argument("--verbose", action="store_true", help="show application output")
+    args = parser.parse_args()
+
+    sizes = [int(p) for p in args.pages.split(",") if p.strip()]
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_root)
+    workdir = tempfile.mkdtemp(prefix="contrasignal-bench-")
+    configure_environment(workdir, args)
+
+    from benchmarks.fakes import FakeGenerativeModel, install_fakes
+    install_fakes(args.llm_latency, args.news_latency, args.embed_latency)
+    import backend.main  # noqa: F401  (configures logging)
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        standalone = run_standalone(sizes, workdir, statements=not args.text_only)
+        under_load = StageTimings()
+        instrument(under_load)
+        load = asyncio.run(run_load(args, sizes, workdir))
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json_path", "baseline", "verbose")},
+        "standalone": standalone.summary(),
+        "under_load": under_load.summary(),
+        "load": load,
+        "llm_calls": FakeGenerativeModel.calls,
+    }
+
+    print(f"Scratch dir: {workdir}")
+    print_table("Standalone (one call per report size)", report["standalone"])
+    print_table(f"Under load ({args.jobs} jobs, {args.concurrency} concurrent)", report["under_load"])
+    print(f"\nJobs: {load['completed']}/{load['jobs']} completed in {load['wall_s']}s "
+          f"-> {load['jobs_per_minute']} jobs/minute "
+          f"(latency p50 {load['latency_p50_s']}s, p95 {load['latency_p95_s']}s, {report['llm_calls']} LLM calls)")
+    for failure in load["failed"]:
+        print(f"  FAILED {failure['company']}: {failure['error']}")
+
+    if args.json_path:
+        with open(os.path.join(repo_root, args.json_path) if not os.path.isabs(args.json_path) else args.json_path,
+                  "w") as fh:
+            json.dump(report, fh, indent=2)
+
+    if args.baseline:
+        baseline_path = args.baseline if os.path.isabs(args.baseline) else os.path.join(repo_root, args.baseline)
+        with open(baseline_path) as fh:
+            problems = compare_to_baseline(report, json.load(fh), args.tolerance)
+        if problems:
+            print("\nRegressions vs baseline:")
+            for p in problems:
+                print(f"  - {p}")
+            sys.exit(1)
+        print("\nNo regressions vs baseline.")
+    if load["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Synthetic annual-report PDFs for benchmarking.
+
+Writes plain PDF 1.4 by hand (no PDF library needed): narrative pages plus a
+ruled income statement and balance sheet that pdfplumber detects as tables.
+"""
+import random
+from typing import List, Tuple
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+MARGIN = 50
+LINE_HEIGHT = 14
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+
+SENTENCES = [
+    "{company} reported revenue from operations of Rs {revenue:,} crore, up {growth}% year on year.",
+    "Net profit for the year stood at Rs {profit:,} crore, reflecting a margin of {margin}%.",
+    "The Board recommended a final dividend, continuing the company's record of shareholder returns.",
+    "Management expects demand in core segments to remain resilient over the coming financial year.",
+    "Capital expenditure was directed towards capacity expansion and digital transformation programmes.",
+    "Total borrowings were reduced to Rs {debt:,} crore as the company deleveraged its balance sheet.",
+    "Return on equity improved to {roe}% on the back of better asset utilisation.",
+    "Input cost inflation moderated in the second half, supporting operating margins.",
+    "The company continues to invest in research and development and new product launches.",
+    "Risk management processes were strengthened across credit, liquidity and operational risk.",
+    "Export revenue grew on the back of new customer wins in Europe and North America.",
+    "Employee headcount increased as the company expanded its engineering and sales teams.",
+    "The order book at year end provides visibility for revenue over the next eight quarters.",
+    "Working capital cycle improved by twelve days owing to tighter receivables management.",
+]
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _text(x: float, y: float, text: str, size: int = 10) -> str:
+    return f"BT /F1 {size} Tf {x:.1f} {y:.1f} Td ({_escape(text)}) Tj ET"
+
+def _table(top: float, rows: List[Tuple[str, str, str]], widths=(280, 110, 110), row_height: float = 18) -> str:
+    """Ruled grid with one text line per cell; ruling lines make pdfplumber's lattice detection work."""
+    ops = ["0.5 w"]
+    left = MARGIN
+    right = left + sum(widths)
+    bottom = top - row_height * len(rows)
+    for r in range(len(rows) + 1):
+        y = top - r * row_height
+        ops.append(f"{left} {y:.1f} m {right} {y:.1f} l S")
+    x = left
+    for w in (0,) + tuple(widths):
+        x += w
+        ops.append(f"{x:.1f} {top:.1f} m {x:.1f} {bottom:.1f} l S")
+    for r, row in enumerate(rows):
+        y = top - (r + 1) * row_height + 5
+        x = left
+        for cell, w in zip(row, widths):
+            ops.append(_text(x + 4, y, cell, 9))
+            x += w
+    return "\n".join(ops)
+
+def _figures(rng: random.Random) -> dict:
+    revenue = rng.randint(5_000, 200_000)
+    growth = round(rng.uniform(-5, 25), 1)
+    margin = round(rng.uniform(3, 22), 1)
+    profit = int(revenue * margin / 100)
+    equity = int(profit / rng.uniform(0.08, 0.25))
+    debt = int(equity * rng.uniform(0.05, 1.5))
+    return {
+        "revenue": revenue, "prev_revenue": int(revenue / (1 + growth / 100)), "growth": growth,
+        "margin": margin, "profit": profit, "equity": equity, "debt": debt,
+        "roe": round(profit / equity * 100, 1),
+    }
+
+def _statement_pages(company: str, f: dict) -> List[str]:
+    fmt = lambda v: f"{v:,}"
+    income = [
+        ("Particulars", "FY2025", "FY2024"),
+        ("Revenue from operations", fmt(f["revenue"]), fmt(f["prev_revenue"])),
+        ("Other income", fmt(f["revenue"] // 50), fmt(f["prev_revenue"] // 50)),
+        ("Total income", fmt(f["revenue"] + f["revenue"] // 50), fmt(f["prev_revenue"] + f["prev_revenue"] // 50)),
+        ("Total expenses", fmt(f["revenue"] - f["profit"]), fmt(f["prev_revenue"] - f["profit"])),
+        ("Tax expense", fmt(f["profit"] // 4), fmt(f["profit"] // 5)),
+        ("Profit for the year", fmt(f["profit"]), fmt(int(f["profit"] * 0.9))),
+    ]
+    balance = [
+        ("Particulars", "FY2025", "FY2024"),
+        ("Share capital", fmt(f["equity"] // 10), fmt(f["equity"] // 10)),
+        ("Other equity", fmt(f["equity"] - f["equity"] // 10), fmt(int(f["equity"] * 0.8))),
+        ("Total equity", fmt(f["equity"]), fmt(int(f["equity"] * 0.9))),
+        ("Borrowings", fmt(f["debt"]), fmt(int(f["debt"] * 1.1))),
+        ("Other liabilities", fmt(f["revenue"] // 5), fmt(f["revenue"] // 6)),
+        ("Total assets", fmt(f["equity"] + f["debt"] + f["revenue"] // 5),
+         fmt(int(f["equity"] * 0.9) + int(f["debt"] * 1.1) + f["revenue"] // 6)),
+    ]
+    top = PAGE_HEIGHT - MARGIN
+    return [
+        "\n".join([_text(MARGIN, top, f"{company} - Statement of Profit and Loss (Rs crore)", 12),
+                   _table(top - 20, income)]),
+        "\n".join([_text(MARGIN, top, f"{company} - Balance Sheet (Rs crore)", 12),
+                   _table(top - 20, balance)]),
+    ]
+
+def _narrative_page(company: str, f: dict, rng: random.Random, page_no: int) -> str:
+    lines = [_text(MARGIN, PAGE_HEIGHT - MARGIN, f"{company} Annual Report 2025 - page {page_no}", 12)]
+    y = PAGE_HEIGHT - MARGIN - 2 * LINE_HEIGHT
+    for _ in range(LINES_PER_PAGE - 3):
+        lines.append(_text(MARGIN, y, rng.choice(SENTENCES).format(company=company, **f)))
+        y -= LINE_HEIGHT
+    return "\n".join(lines)
+
+def build_pdf(page_streams: List[str]) -> bytes:
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for stream in page_streams:
+        data = stream.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        content_id = len(objects)
+        objects.append((f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                        f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode())
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+def make_annual_report(company: str, pages: int, seed: int = 0, statements: bool = True) -> bytes:
+    """
+    Deterministic report for `company` with `pages` pages. With `statements`,
+    the last two pages are the income statement and balance sheet, so the
+    fundamentals can be computed from tables without the LLM.
+    """
+    rng = random.Random(f"{company}|{seed}")
+    f = _figures(rng)
+    tail = _statement_pages(company, f) if statements else []
+    narrative = max(1, pages - len(tail))
+    streams = [_narrative_page(company, f, rng, i + 1) for i in range(narrative)] + tail
+    return build_pdf(streams)
+
+def write_annual_report(path: str, company: str, pages: int, seed: int = 0, statements: bool = True) -> str:
+    with open(path, "wb") as fh:
+        fh.write(make_annual_report(company, pages, seed, statements))
+    return path
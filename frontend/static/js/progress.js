@@ -26,58 +26,87 @@ document.addEventListener('DOMContentLoaded', () => {
         'signal': document.getElementById('step_signal')
     };
 
-    // Poll status
-    const pollInterval = setInterval(async () => {
-        try {
-            const response = await fetch(`/api/status/${jobId}`);
-            const data = await response.json();
+    let finished = false;
+    let pollInterval = null;
 
-            console.log(`[Polling] Status: ${data.status}, Progress: ${data.progress}%`);
+    function render(data) {
+        console.log(`[Progress] Status: ${data.status}, Progress: ${data.progress}%`);
 
-            // Update Progress Bar
-            document.getElementById('progressBar').style.width = `${data.progress}%`;
+        // Update Progress Bar
+        document.getElementById('progressBar').style.width = `${data.progress}%`;
 
-            // Update Steps
-            // Logic: Mark all previous steps as done, current as active
-            const stepOrder = ['news', 'fundamentals', 'peers', 'signal'];
-            let currentFound = false;
+        // Update Steps
+        // Logic: Mark all previous steps as done, current as active
+        const stepOrder = ['news', 'fundamentals', 'peers', 'signal'];
+        let currentFound = false;
 
-            stepOrder.forEach(stepKey => {
-                const el = steps[stepKey];
-                if (!el) return;
+        stepOrder.forEach(stepKey => {
+            const el = steps[stepKey];
+            if (!el) return;
 
-                if (data.status === 'completed') {
+            if (data.status === 'completed') {
+                markComplete(el);
+            } else if (data.status === 'failed') {
+                el.classList.add('error'); // Add error style if needed
+            } else {
+                // Running
+                if (stepKey === data.current_step) {
+                    markActive(el);
+                    currentFound = true;
+                } else if (!currentFound) {
                     markComplete(el);
-                } else if (data.status === 'failed') {
-                    el.classList.add('error'); // Add error style if needed
                 } else {
-                    // Running
-                    if (stepKey === data.current_step) {
-                        markActive(el);
-                        currentFound = true;
-                    } else if (!currentFound) {
-                        markComplete(el);
-                    } else {
-                        markPending(el);
-                    }
+                    markPending(el);
                 }
-            });
-
-            if (data.status === 'completed') {
-                clearInterval(pollInterval);
-                setTimeout(() => {
-                    window.location.href = `/results/${jobId}`;
-                }, 1000);
-            } else if (data.status === 'failed') {
-                clearInterval(pollInterval);
-                alert(`Analysis failed: ${data.error}`);
-                window.location.href = '/analyze';
             }
+        });
 
-        } catch (error) {
-            console.error('Polling error', error);
+        if (finished) return;
+        if (data.status === 'completed') {
+            finished = true;
+            stopUpdates();
+            setTimeout(() => {
+                window.location.href = `/results/${jobId}`;
+            }, 1000);
+        } else if (data.status === 'failed') {
+            finished = true;
+            stopUpdates();
+            alert(`Analysis failed: ${data.error}`);
+            window.location.href = '/analyze';
         }
-    }, 2000);
+    }
+
+    // Fallback: poll the lightweight status endpoint (no result payload)
+    function startPolling() {
+        if (pollInterval || finished) return;
+        pollInterval = setInterval(async () => {
+            try {
+                const response = await fetch(`/api/status/${jobId}`);
+                render(await response.json());
+            } catch (error) {
+                console.error('Polling error', error);
+            }
+        }, 2000);
+    }
+
+    // Preferred: server pushes progress deltas as they happen
+    let source = null;
+    if (window.EventSource) {
+        source = new EventSource(`/api/events/${jobId}`);
+        source.onmessage = (event) => render(JSON.parse(event.data));
+        source.onerror = () => {
+            source.close();
+            source = null;
+            startPolling();
+        };
+    } else {
+        startPolling();
+    }
+
+    function stopUpdates() {
+        if (source) source.close();
+        if (pollInterval) clearInterval(pollInterval);
+    }
 
     function markComplete(el) {
         el.className = 'step-item completed';
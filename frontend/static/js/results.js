@@ -10,7 +10,7 @@ document.addEventListener('DOMContentLoaded', async () => {
 
     // 2. Fetch Data
     try {
-        const response = await fetch(`/api/status/${jobId}`);
+        const response = await fetch(`/api/status/${jobId}?include_result=true`);
         const jobData = await response.json();
 
         if (jobData.status !== 'completed' || !jobData.result) {
@@ -118,6 +118,8 @@ document.addEventListener('DOMContentLoaded', async () => {
         // --- Peers ---
         try {
             document.getElementById('compPosition').textContent = (peers.competitive_position || 'Unknown').toUpperCase();
+            const peerSummary = document.getElementById('peerSummary');
+            if (peerSummary) peerSummary.textContent = peers.summary || '';
             const peerTable = document.getElementById('peerTableBody');
 
             // Add Target Row First
@@ -176,18 +178,48 @@ document.addEventListener('DOMContentLoaded', async () => {
         appendMessage('user', q);
         chatInput.value = '';
 
-        // API Call
+        // Streamed answer: tokens are appended to one bubble as they arrive
+        const bubble = appendMessage('bot', '');
         try {
-            const res = await fetch(`/api/ask/${jobId}`, {
+            const res = await fetch(`/api/ask/${jobId}/stream`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ question: q })
             });
-            const data = await res.json();
-
-            appendMessage('bot', data.answer);
+            if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let sources = [];
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const evt of events) {
+                    if (!evt.startsWith('data: ')) continue;
+                    const data = JSON.parse(evt.slice(6));
+                    if (data.token) bubble.textContent += data.token;
+                    if (data.error) bubble.textContent = data.error;
+                    if (data.done && data.sources) sources = data.sources;
+                    chatHistory.scrollTop = chatHistory.scrollHeight;
+                }
+            }
+            if (!bubble.textContent) bubble.textContent = 'Sorry, I could not find an answer to that.';
+            if (sources.length) {
+                // Report pages/sections the answer was drawn from
+                const cite = document.createElement('div');
+                cite.style.color = '#6B7280';
+                cite.style.fontSize = '0.8em';
+                cite.style.marginTop = '6px';
+                cite.textContent = `Sources: ${sources.join('; ')}`;
+                bubble.appendChild(cite);
+            }
         } catch (err) {
-            appendMessage('bot', 'Sorry, I encountered an error answering that.');
+            bubble.textContent = 'Sorry, I encountered an error answering that.';
         }
     }
 
@@ -197,6 +229,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         div.textContent = text;
         chatHistory.appendChild(div);
         chatHistory.scrollTop = chatHistory.scrollHeight;
+        return div;
     }
 
     if (askBtn) askBtn.addEventListener('click', () => askQuestion(chatInput.value));